@@ -0,0 +1,28 @@
+"""user email
+
+Revision ID: 3d8a5c27f914
+Revises: 9b3e61d4a7c2
+Create Date: 2026-10-18 17:02:31.918540
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d8a5c27f914'
+down_revision: Union[str, None] = '9b3e61d4a7c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('email', sa.String(), nullable=True))
+    op.create_unique_constraint('uq_users_email', 'users', ['email'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_users_email', 'users', type_='unique')
+    op.drop_column('users', 'email')
@@ -0,0 +1,36 @@
+"""Event full text search index
+
+Revision ID: 5f1c9a7e2b40
+Revises: d322df568943
+Create Date: 2026-10-18 14:24:37.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f1c9a7e2b40'
+down_revision: Union[str, None] = 'd322df568943'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must stay identical to models.search_document or the planner won't use the index
+SEARCH_DOCUMENT = "to_tsvector('simple', coalesce(subject, '') || ' ' || coalesce(description, ''))"
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.create_index(
+        'ix_events_search_fts', 'events', [sa.text(SEARCH_DOCUMENT)],
+        unique=False, postgresql_using='gin'
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_events_search_fts', table_name='events')
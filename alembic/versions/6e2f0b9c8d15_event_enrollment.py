@@ -0,0 +1,38 @@
+"""event enrollment
+
+Revision ID: 6e2f0b9c8d15
+Revises: 3d8a5c27f914
+Create Date: 2026-10-18 17:48:06.114729
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e2f0b9c8d15'
+down_revision: Union[str, None] = '3d8a5c27f914'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('events', sa.Column('capacity', sa.Integer(), nullable=True))
+    op.add_column('events', sa.Column('enrolled_count', sa.Integer(), server_default='0', nullable=False))
+    # Rows written before enrollment existed
+    op.execute(
+        "UPDATE events SET enrolled_count = "
+        "(SELECT count(*) FROM user_events WHERE user_events.event_id = events.id)"
+    )
+    op.create_check_constraint(
+        'ck_events_enrollment', 'events',
+        'enrolled_count >= 0 AND (capacity IS NULL OR enrolled_count <= capacity)'
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('ck_events_enrollment', 'events', type_='check')
+    op.drop_column('events', 'enrolled_count')
+    op.drop_column('events', 'capacity')
@@ -0,0 +1,32 @@
+"""Hot lookup indexes
+
+Revision ID: a41e07c3d9f2
+Revises: 5f1c9a7e2b40
+Create Date: 2026-10-18 14:38:05.117623
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41e07c3d9f2'
+down_revision: Union[str, None] = '5f1c9a7e2b40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_users_role_id'), 'users', ['role_id'], unique=False)
+    op.create_index(op.f('ix_events_end_date'), 'events', ['end_date'], unique=False)
+    op.create_index(op.f('ix_event_images_event_id'), 'event_images', ['event_id'], unique=False)
+    op.create_index(op.f('ix_user_events_event_id'), 'user_events', ['event_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_user_events_event_id'), table_name='user_events')
+    op.drop_index(op.f('ix_event_images_event_id'), table_name='event_images')
+    op.drop_index(op.f('ix_events_end_date'), table_name='events')
+    op.drop_index(op.f('ix_users_role_id'), table_name='users')
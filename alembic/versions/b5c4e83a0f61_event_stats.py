@@ -0,0 +1,43 @@
+"""event stats
+
+Revision ID: b5c4e83a0f61
+Revises: 6e2f0b9c8d15
+Create Date: 2026-10-18 18:35:52.640381
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5c4e83a0f61'
+down_revision: Union[str, None] = '6e2f0b9c8d15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('events', sa.Column('teacher_name', sa.String(length=50), nullable=True))
+    op.add_column('user_events', sa.Column('rating', sa.SmallInteger(), nullable=True))
+    op.create_check_constraint('ck_user_events_rating', 'user_events', 'rating BETWEEN 1 AND 5')
+    op.create_table('event_stats',
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('rating_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('rating_sum', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('avg_rating', sa.Float(), nullable=True),
+    sa.Column('progress', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('refreshed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('event_id')
+    )
+    # Progress is filled in by the first event_stats_refresh run
+    op.execute("INSERT INTO event_stats (event_id) SELECT id FROM events")
+
+
+def downgrade() -> None:
+    op.drop_table('event_stats')
+    op.drop_constraint('ck_user_events_rating', 'user_events', type_='check')
+    op.drop_column('user_events', 'rating')
+    op.drop_column('events', 'teacher_name')
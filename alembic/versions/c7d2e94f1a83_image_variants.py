@@ -0,0 +1,28 @@
+"""Image variants
+
+Revision ID: c7d2e94f1a83
+Revises: a41e07c3d9f2
+Create Date: 2026-10-18 15:02:44.530917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d2e94f1a83'
+down_revision: Union[str, None] = 'a41e07c3d9f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('event_images', sa.Column('variants', sa.JSON(), nullable=True))
+    op.add_column('user_images', sa.Column('variants', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('user_images', 'variants')
+    op.drop_column('event_images', 'variants')
@@ -0,0 +1,26 @@
+"""Event keyset index
+
+Revision ID: d322df568943
+Revises: 82d37190e8cf
+Create Date: 2026-10-18 14:10:12.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd322df568943'
+down_revision: Union[str, None] = '82d37190e8cf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_events_start_date_id', 'events', ['start_date', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_events_start_date_id', table_name='events')
@@ -0,0 +1,37 @@
+"""updated_at version columns
+
+Revision ID: e18b5f0c6d27
+Revises: c7d2e94f1a83
+Create Date: 2026-10-18 15:31:09.284417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e18b5f0c6d27'
+down_revision: Union[str, None] = 'c7d2e94f1a83'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Naive utc like the values the app writes
+    if op.get_context().dialect.name == 'postgresql':
+        now = sa.text("TIMEZONE('utc', CURRENT_TIMESTAMP)")
+    else:
+        now = sa.text('CURRENT_TIMESTAMP')
+    for table in ('events', 'users'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        # Existing rows start out at their creation time, the ETags need a version
+        op.execute(f"UPDATE {table} SET updated_at = COALESCE(created_at, {now.text})")
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False, server_default=now)
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'updated_at')
+    op.drop_column('events', 'updated_at')
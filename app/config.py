@@ -1,13 +1,20 @@
 import logging
-from os import path
-from fastapi import FastAPI
+from os import getenv, path
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-from models.models import Base
-from core.database import engine, SessionLocal
+from core.metrics import METRICS_ENABLED
+from middleware.metrics import MetricsMiddleware
 from pydantic_settings import BaseSettings
-from services.services import initialize_super_admin
+from sqlalchemy.exc import DBAPIError
+from core.database import is_retryable
+from services.services import bootstrap_database
+from services.jobs import worker, JOBS_ENABLED
+from services.smtp import mailer
+from services.sessions import revocations
+import services.tasks  # registers the job handlers
 
 
 
@@ -27,10 +34,14 @@ import routers.event_admin
 import routers.user
 import routers.admin
 import routers.admin_pannel
+import routers.internal
+import routers.metrics
 
 
 app = FastAPI()
-Base.metadata.create_all(engine)
+# Tables and the super admin are set up at startup by default. The production entrypoint
+# (main.py --production) does it once up front and turns this off for its workers
+DB_BOOTSTRAP = getenv("DB_BOOTSTRAP", "true").lower() == "true"
 
 
 templates = Jinja2Templates(directory="app/templates")
@@ -50,12 +61,27 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Added last so it wraps everything else, CORS included
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
 
 app.include_router(router= routers.auth.router, tags=["Auth"])
 app.include_router(router= routers.admin.router, tags=["Admin"])
 app.include_router(router= routers.event_admin.router ,tags=["Admin-Event"])
 app.include_router(router= routers.user.router, tags=["User"])
 app.include_router(router= routers.admin_pannel.router, tags=["Admin Pannel"])
+app.include_router(router= routers.internal.router, tags=["Internal"])
+app.include_router(router= routers.metrics.router, tags=["Internal"])
+
+
+@app.exception_handler(DBAPIError)
+async def database_busy(request: Request, exc: DBAPIError):
+    """Lock contention (e.g. a burst of joins on one event) answers 503 with Retry-After
+    instead of a 500, anything else is still a server error"""
+    if not is_retryable(exc):
+        raise exc
+    logger.warning(f"Database busy on {request.method} {request.url.path}: {exc.orig}")
+    return JSONResponse(status_code=503, content={"detail": "Database busy, retry shortly"}, headers={"Retry-After": "1"})
 
 @app.on_event("startup")
 async def startup_event():
@@ -63,10 +89,19 @@ async def startup_event():
     FastAPI startup event to initialize super admin
     """
     logger.info("Starting application...")
-    try:
-        db = SessionLocal()
-        await initialize_super_admin(db)
-    except Exception as e:
-        logger.error(f"Error during startup: {str(e)}")
-    finally:
-        db.close()
\ No newline at end of file
+    if DB_BOOTSTRAP:
+        try:
+            await bootstrap_database()
+        except Exception as e:
+            logger.error(f"Error during startup: {str(e)}")
+    await revocations.start()
+    if JOBS_ENABLED:
+        await worker.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await revocations.stop()
+    if JOBS_ENABLED:
+        await worker.stop()
+    mailer.close()
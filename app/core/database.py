@@ -1,23 +1,108 @@
 from sqlalchemy import create_engine
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from core.pool import PoolStats, instrumented_pool, attach_pool_stats
+from core.metrics import METRICS_ENABLED, attach_query_metrics
+from core.profiler import SQL_PROFILER_ENABLED, attach_profiler
 from dotenv import load_dotenv
 import os
 load_dotenv()
 
-DB_USER_NAME = os.getenv("DB_USER_NAME") 
+DB_USER_NAME = os.getenv("DB_USER_NAME")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_HOST_NAME = os.getenv("DB_HOST_NAME")
 DB_NAME = os.getenv("DB_NAME")
 DB_PORT = os.getenv("DB_PORT")
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Pool sizing, applied per engine and per worker process
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# Async drivers for the request path, the sync url above stays for alembic and startup seeding
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto its async driver, urls that already name one are kept"""
+    scheme, sep, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+
+def pool_options(url: str, pool_class: type, stats: PoolStats) -> dict:
+    """Engine kwargs for the configured queue pool, sqlite keeps its own default pool"""
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "poolclass": instrumented_pool(pool_class, stats),
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+sync_pool_stats = PoolStats("sync")
+async_pool_stats = PoolStats("async")
+
 #DATABASE_URL = f"postgresql+psycopg2://{DB_USER_NAME}:{DB_PASSWORD}@{DB_HOST_NAME}:{DB_PORT}/{DB_NAME}"
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL, QueuePool, sync_pool_stats))
 SessionLocal = sessionmaker(autoflush= False, autocommit= False, bind=engine)
 
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, **pool_options(ASYNC_DATABASE_URL, AsyncAdaptedQueuePool, async_pool_stats)
+)
+attach_pool_stats(engine.pool, sync_pool_stats)
+attach_pool_stats(async_engine.sync_engine.pool, async_pool_stats)
+if METRICS_ENABLED:
+    attach_query_metrics(engine, "sync")
+    attach_query_metrics(async_engine.sync_engine, "async")
+if SQL_PROFILER_ENABLED:
+    attach_profiler(engine)
+    attach_profiler(async_engine.sync_engine)
+# expire_on_commit is off so handlers can keep returning rows after commit without a lazy reload
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Postgres serialization_failure, deadlock_detected and lock_not_available
+RETRYABLE_SQLSTATES = {"40001", "40P01", "55P03"}
+
+
+def is_retryable(error: DBAPIError) -> bool:
+    """Lock contention that a retry can get past, as opposed to a bad statement or a lost
+    connection. SQLite reports a busy timeout running out as 'database is locked'"""
+    orig = error.orig
+    code = getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)
+    return code in RETRYABLE_SQLSTATES or "database is locked" in str(orig)
+
+
+def pool_status() -> dict:
+    return {
+        "sync": sync_pool_stats.snapshot(engine.pool),
+        "async": async_pool_stats.snapshot(async_engine.sync_engine.pool),
+    }
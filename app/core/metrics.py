@@ -0,0 +1,214 @@
+import os
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import event
+
+
+load_dotenv()
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """One metric family, children keyed by their label values. Updates from the S3 threads
+    and the event loop share a lock, held only for a dict lookup and an add"""
+
+    kind = ""
+
+    def __init__(self, name: str, help_: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help_
+        self.label_names = tuple(labels)
+        self._lock = Lock()
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_labels(self.label_names, labels)} {_number(value)}" for labels, value in values
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        super().__init__(name, help_, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str) -> None:
+        # Per bucket counts (not cumulative), the +Inf slot is the last one, summed up on render
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            child = self._values.get(labels)
+            if child is None:
+                child = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            child[0][index] += 1
+            child[1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        lines = self.header()
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {total!r}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format 0.0.4"""
+        return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route template and status", ("method", "route", "status")
+))
+http_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "Time from request start to the last body chunk sent", ("method", "route")
+))
+http_in_flight = registry.register(Gauge("http_requests_in_flight", "HTTP requests being handled"))
+http_response_size = registry.register(Histogram(
+    "http_response_size_bytes", "Response body size", ("method", "route"), SIZE_BUCKETS
+))
+db_query_latency = registry.register(Histogram(
+    "db_query_duration_seconds", "Statement execution time, requests and background jobs alike", ("engine",), QUERY_BUCKETS
+))
+db_request_queries = registry.register(Histogram(
+    "db_queries_per_request", "Statements run while handling one request", ("route",), COUNT_BUCKETS
+))
+db_request_time = registry.register(Histogram(
+    "db_time_per_request_seconds", "Statement time spent while handling one request", ("route",), LATENCY_BUCKETS
+))
+s3_latency = registry.register(Histogram(
+    "s3_request_duration_seconds", "S3 API call time, retries included", ("operation", "outcome")
+))
+
+
+class RequestMetrics:
+    """Per request accumulator, reachable from engine events through current_request"""
+
+    __slots__ = ("scope", "queries", "query_seconds", "statements")
+
+    def __init__(self, scope: Dict[str, Any]) -> None:
+        self.scope = scope
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.statements: Optional[Dict[str, int]] = None  # fingerprint counts, kept by the SQL profiler
+
+    @property
+    def route(self) -> str:
+        return route_label(self.scope)
+
+
+# Copied into run_in_threadpool calls and SQLAlchemy's greenlets, so queries from sync
+# dependencies and the async session both land on the request that issued them
+current_request: ContextVar[Optional[RequestMetrics]] = ContextVar("current_request", default=None)
+
+
+def route_label(scope: Dict[str, Any]) -> str:
+    """The matched route's path template, raw paths would give every id its own series"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def attach_query_metrics(engine, name: str) -> None:
+    """Time every statement through cursor events on a sync Engine (async_engine.sync_engine
+    for the async one). Start times sit on a per connection stack, statements don't nest
+    but a failed one never reaches after_cursor_execute"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = perf_counter() - conn.info["query_start"].pop()
+        db_query_latency.observe(elapsed, name)
+        request = current_request.get()
+        if request is not None:
+            request.queries += 1
+            request.query_seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def on_error(context):
+        stack = context.connection.info.get("query_start") if context.connection is not None else None
+        if stack:
+            stack.pop()
+
+
+def instrument_s3(client) -> None:
+    """Time the client's API calls through botocore's call events. Event names end in the
+    operation (after-call-error carries no model)"""
+
+    def before_call(context, **kwargs):
+        context["metrics_start"] = perf_counter()
+
+    def after_call(event_name, context, parsed=None, exception=None, **kwargs):
+        start = context.pop("metrics_start", None)
+        if start is None:
+            return
+        failed = exception is not None or (parsed or {}).get("Error")
+        s3_latency.observe(perf_counter() - start, event_name.rsplit(".", 1)[-1], "error" if failed else "ok")
+
+    client.meta.events.register("before-call.s3", before_call)
+    client.meta.events.register("after-call.s3", after_call)
+    client.meta.events.register("after-call-error.s3", after_call)
@@ -0,0 +1,99 @@
+from threading import Lock
+from time import perf_counter
+from typing import Dict, Any
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+
+class PoolStats:
+    """Running counters for one engine's connection pool, read by the internal stats endpoint"""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._lock = Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+
+    def incr(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def snapshot(self, pool) -> Dict[str, Any]:
+        data = {
+            "pool_class": type(pool).__name__,
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "invalidations": self.invalidations,
+            "waits": self.waits,
+            "wait_seconds_total": round(self.wait_seconds, 6),
+            "wait_seconds_max": round(self.max_wait_seconds, 6),
+            "timeouts": self.timeouts,
+        }
+        # Live gauges only exist on queue pools (sqlite falls back to singleton/null pools)
+        if isinstance(pool, QueuePool):
+            data.update({
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+            })
+        return data
+
+
+def instrumented_pool(base: type, stats: PoolStats) -> type:
+    """Build a QueuePool subclass that times checkouts that have to wait for a free connection,
+    i.e. overflow is used up and no idle connection is queued. stats lives on the class so it
+    survives pool.recreate() after a dispose"""
+
+    class InstrumentedPool(base):
+        pool_stats = stats
+
+        def _do_get(self):
+            # At capacity with an idle connection queued the get returns straight away
+            must_wait = self._max_overflow > -1 and self._overflow >= self._max_overflow and self._pool.empty()
+            start = perf_counter()
+            try:
+                return super()._do_get()
+            except exc.TimeoutError:
+                self.pool_stats.incr("timeouts")
+                raise
+            finally:
+                if must_wait:
+                    self.pool_stats.record_wait(perf_counter() - start)
+
+    InstrumentedPool.__name__ = f"Instrumented{base.__name__}"
+    return InstrumentedPool
+
+
+def attach_pool_stats(pool, stats: PoolStats) -> None:
+    """Count connects/checkouts/checkins/invalidations through pool events"""
+
+    @event.listens_for(pool, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        stats.incr("connects")
+
+    @event.listens_for(pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.incr("checkouts")
+
+    @event.listens_for(pool, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        stats.incr("checkins")
+
+    @event.listens_for(pool, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        stats.incr("invalidations")
+
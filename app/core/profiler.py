@@ -0,0 +1,149 @@
+import logging
+import os
+import re
+from functools import lru_cache
+from threading import Lock
+from time import perf_counter
+from typing import Any, Dict, List, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import event
+from core.metrics import current_request
+
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Off by default, it adds a fingerprint lookup and a lock to every statement
+SQL_PROFILER_ENABLED = os.getenv("SQL_PROFILER_ENABLED", "false").lower() == "true"
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", 200))
+# A fingerprint run this many times by one request is reported as a likely N+1. Routes and
+# N+1 detection come from the metrics middleware's request context (METRICS_ENABLED)
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", 10))
+SQL_PROFILER_MAX_FINGERPRINTS = int(os.getenv("SQL_PROFILER_MAX_FINGERPRINTS", 2000))
+SQL_LOG_MAX_CHARS = 1000
+
+OVERFLOW = "<other>"  # bucket for new fingerprints once the table is full
+
+_PLACEHOLDER = r"(?:\?|\$\d+|%\(\w+\)s|%s)"
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.$])-?\d+(?:\.\d+)?\b")
+_PARAM = re.compile(_PLACEHOLDER)
+# IN lists and multi-row VALUES differ per call only in length
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_ROWS = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """Statement with literals and placeholders folded into ?, so calls differing only in
+    values (or IN list length) share one entry. Cached, the ORM emits the same strings"""
+    normalized = _SPACE.sub(" ", statement).strip()
+    normalized = _STRING.sub("?", normalized)
+    normalized = _PARAM.sub("?", normalized)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _LIST.sub("(?)", normalized)
+    return _ROWS.sub("(?)", normalized)
+
+
+class QueryProfile:
+    """Statement fingerprints with their call counts and time, plus the N+1 patterns seen,
+    for this worker since start (or the last reset)"""
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._stats: Dict[str, List[Any]] = {}  # fingerprint -> [calls, total, max, slow, routes]
+        self._n_plus_one: Dict[Tuple[str, str], List[int]] = {}  # (route, fingerprint) -> [requests, max repeats]
+
+    def record(self, statement: str, seconds: float, request=None) -> None:
+        """request is the RequestMetrics of the request running the statement, if any"""
+        route = request.route if request is not None else "background"
+        key = fingerprint(statement)
+        slow = seconds * 1000 >= SQL_SLOW_QUERY_MS
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                if len(self._stats) >= SQL_PROFILER_MAX_FINGERPRINTS:
+                    key = OVERFLOW
+                entry = self._stats.setdefault(key, [0, 0.0, 0.0, 0, set()])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            entry[3] += slow
+            if len(entry[4]) < 20:
+                entry[4].add(route)
+        if slow:
+            statement = _SPACE.sub(" ", statement).strip()[:SQL_LOG_MAX_CHARS]
+            logger.warning(f"Slow query {seconds * 1000:.1f} ms on {route}: {statement}")
+        if request is not None:
+            self._count_in_request(request, key, route)
+
+    def _count_in_request(self, request, key: str, route: str) -> None:
+        if request.statements is None:
+            request.statements = {}
+        repeats = request.statements[key] = request.statements.get(key, 0) + 1
+        if repeats < SQL_N_PLUS_ONE_THRESHOLD or key == OVERFLOW:
+            return
+        with self._lock:
+            entry = self._n_plus_one.setdefault((route, key), [0, 0])
+            if repeats == SQL_N_PLUS_ONE_THRESHOLD:
+                entry[0] += 1
+            entry[1] = max(entry[1], repeats)
+        if repeats == SQL_N_PLUS_ONE_THRESHOLD:
+            logger.warning(f"Possible N+1 on {route}: statement repeated {repeats} times: {key[:SQL_LOG_MAX_CHARS]}")
+
+    def top(self, limit: int = 20, order: str = "total") -> Dict[str, Any]:
+        sort_key = {"total": 1, "calls": 0, "max": 2}[order]
+        with self._lock:
+            stats = sorted(self._stats.items(), key=lambda item: item[1][sort_key], reverse=True)[:limit]
+            n_plus_one = sorted(self._n_plus_one.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+            fingerprints = len(self._stats)
+        return {
+            "enabled": SQL_PROFILER_ENABLED,
+            "slow_query_ms": SQL_SLOW_QUERY_MS,
+            "fingerprints": fingerprints,
+            "statements": [
+                {
+                    "fingerprint": key,
+                    "calls": calls,
+                    "total_ms": round(total * 1000, 3),
+                    "mean_ms": round(total * 1000 / calls, 3),
+                    "max_ms": round(longest * 1000, 3),
+                    "slow": slow,
+                    "routes": sorted(routes),
+                }
+                for key, (calls, total, longest, slow, routes) in stats
+            ],
+            "n_plus_one": [
+                {"route": route, "fingerprint": key, "requests": requests, "max_repeats": repeats}
+                for (route, key), (requests, repeats) in n_plus_one
+            ],
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self._n_plus_one.clear()
+
+
+profile = QueryProfile()
+
+
+def attach_profiler(engine) -> None:
+    """Time statements on a sync Engine (async_engine.sync_engine for the async one) into
+    the profile. Statements outside a request (jobs, startup) are filed under "background" """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profile_start", []).append(perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = perf_counter() - conn.info["profile_start"].pop()
+        profile.record(statement, elapsed, current_request.get())
+
+    @event.listens_for(engine, "handle_error")
+    def on_error(context):
+        stack = context.connection.info.get("profile_start") if context.connection is not None else None
+        if stack:
+            stack.pop()
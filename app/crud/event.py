@@ -0,0 +1,241 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import Row, Select, select, insert, tuple_, func, literal_column, update, delete, or_, and_, exists, cast, Float
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.models import Event, EventImage, EventStats, UserEvents, search_document, utcnow
+
+
+def first_image_url():
+    """Correlated subquery for an event's first image, so listings get it in the same
+    round trip instead of loading the whole images collection per row"""
+    return (
+        select(EventImage.image_id)
+        .where(EventImage.event_id == Event.id)
+        .order_by(EventImage.id)
+        .limit(1)
+        .correlate(Event)
+        .scalar_subquery()
+        .label("image_url")
+    )
+
+
+# Keyset pagination over (start_date, id), matches ix_events_start_date_id
+def encode_cursor(event: Event) -> str:
+    """Opaque cursor pointing just past the given event"""
+    raw = json.dumps([event.start_date.isoformat(), event.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor, raises ValueError for anything it didn't produce"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        start_date, event_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(start_date), int(event_id)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def apply_keyset(query: Select, cursor: Optional[str], limit: int) -> Select:
+    """Order by (start_date, id) and seek past the cursor instead of using offset.
+    Events without a start_date can't be placed on the key and are left out"""
+    query = query.where(Event.start_date.is_not(None))
+    if cursor:
+        start_date, event_id = decode_cursor(cursor)
+        query = query.where(tuple_(Event.start_date, Event.id) > tuple_(start_date, event_id))
+    return query.order_by(Event.start_date, Event.id).limit(limit)
+
+
+def filter_events(
+    query: Select,
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    search: Optional[str],
+    search_mode: str,
+    dialect: str,
+) -> Select:
+    """Apply the listing filters. search_mode=fulltext matches against ix_events_search_fts
+    and adds a rank column ordered best first, other dialects keep the substring match"""
+    if start_date:
+        query = query.where(Event.start_date >= start_date)
+    if end_date:
+        query = query.where(Event.end_date <= end_date)
+    if not search:
+        return query
+
+    if search_mode == "fulltext" and dialect == "postgresql":
+        document = search_document(Event.subject, Event.description)
+        ts_query = func.websearch_to_tsquery(literal_column("'simple'"), search)
+        rank = func.ts_rank(document, ts_query).label("rank")
+        return (
+            query.add_columns(rank)
+            .where(document.op("@@")(ts_query))
+            .order_by(rank.desc(), Event.id)
+        )
+    return query.where(
+        Event.subject.ilike(f"%{search}%") |
+        Event.description.ilike(f"%{search}%")
+    )
+
+
+async def touch_event(db: AsyncSession, event_id: int) -> None:
+    """Bump updated_at for changes that don't write the events row itself (images)"""
+    await db.execute(update(Event).where(Event.id == event_id).values(updated_at=utcnow()))
+
+
+# Images. One statement per batch, the caller commits once
+
+async def add_event_images(db: AsyncSession, event_id: int, images: List[Dict[str, Any]]) -> List[int]:
+    """Insert {"image_id", "variants"} rows for an event, their ids in the same round trip"""
+    if not images:
+        return []
+    result = await db.execute(
+        insert(EventImage).returning(EventImage.id),
+        [{"event_id": event_id, "image_id": image["image_id"], "variants": image.get("variants")} for image in images]
+    )
+    return result.scalars().all()
+
+
+async def remove_event_images(db: AsyncSession, event_id: int, image_ids: Optional[List[int]] = None) -> List[Row]:
+    """Delete the given images of an event (all of them without image_ids), the removed
+    (id, image_id, variants) rows so the caller can clear their bucket objects after commit"""
+    query = delete(EventImage).where(EventImage.event_id == event_id)
+    if image_ids is not None:
+        query = query.where(EventImage.id.in_(image_ids))
+    result = await db.execute(
+        query.returning(EventImage.id, EventImage.image_id, EventImage.variants)
+        .execution_options(synchronize_session=False)
+    )
+    return result.all()
+
+
+# Enrollment. Callers pair take_seat/add_participant and release_seat/remove_participant in
+# one transaction, seat first so joins and leaves lock in the same order, and roll back when
+# either comes back empty. That keeps enrolled_count equal to the user_events rows
+
+async def take_seat(db: AsyncSession, event_id: int) -> Optional[Row]:
+    """Conditional increment, (enrolled_count, capacity) after it or None when the event is
+    full or missing. Concurrent joins only queue on this event's row lock, and Postgres
+    re-checks the WHERE against the count committed by the one before, so a full event
+    turns everyone after the last seat away without any read-then-write race"""
+    result = await db.execute(
+        update(Event)
+        .where(Event.id == event_id, or_(Event.capacity.is_(None), Event.enrolled_count < Event.capacity))
+        .values(enrolled_count=Event.enrolled_count + 1, updated_at=utcnow())
+        .returning(Event.enrolled_count, Event.capacity)
+        .execution_options(synchronize_session=False)
+    )
+    return result.first()
+
+
+async def release_seat(db: AsyncSession, event_id: int) -> Optional[Row]:
+    """Conditional decrement, None when the event is missing or has nobody enrolled"""
+    result = await db.execute(
+        update(Event)
+        .where(Event.id == event_id, Event.enrolled_count > 0)
+        .values(enrolled_count=Event.enrolled_count - 1, updated_at=utcnow())
+        .returning(Event.enrolled_count, Event.capacity)
+        .execution_options(synchronize_session=False)
+    )
+    return result.first()
+
+
+def _insert(db: AsyncSession):
+    """Dialect insert, for ON CONFLICT"""
+    return postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+
+
+async def add_participant(db: AsyncSession, event_id: int, user_id: int) -> bool:
+    """False when the user is already enrolled"""
+    result = await db.execute(
+        _insert(db)(UserEvents).values(user_id=user_id, event_id=event_id)
+        .on_conflict_do_nothing()
+        .returning(UserEvents.user_id)
+    )
+    return result.first() is not None
+
+
+async def remove_participant(db: AsyncSession, event_id: int, user_id: int) -> Optional[Row]:
+    """The removed enrollment (with its rating), None when the user wasn't enrolled"""
+    result = await db.execute(
+        delete(UserEvents)
+        .where(UserEvents.event_id == event_id, UserEvents.user_id == user_id)
+        .returning(UserEvents.user_id, UserEvents.rating)
+        .execution_options(synchronize_session=False)
+    )
+    return result.first()
+
+
+# Stats
+
+async def record_rating(db: AsyncSession, event_id: int, old: Optional[int], new: Optional[int]) -> None:
+    """Apply one participant's rating change (None for no rating, e.g. after leaving) to
+    event_stats. SET expressions see the row before the update, so the average is computed
+    from the same values being incremented"""
+    await db.execute(_insert(db)(EventStats).values(event_id=event_id).on_conflict_do_nothing())
+    delta = (new or 0) - (old or 0)
+    added = (1 if new else 0) - (1 if old else 0)
+    await db.execute(
+        update(EventStats)
+        .where(EventStats.event_id == event_id)
+        .values(
+            rating_sum=EventStats.rating_sum + delta,
+            rating_count=EventStats.rating_count + added,
+            avg_rating=cast(EventStats.rating_sum + delta, Float) / func.nullif(EventStats.rating_count + added, 0),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def event_progress(start_date: Optional[datetime], end_date: Optional[datetime], now: datetime) -> int:
+    if not start_date or now < start_date:
+        return 0
+    if not end_date or now >= end_date:
+        return 100
+    return int((now - start_date) / (end_date - start_date) * 100)
+
+
+async def refresh_event_stats(db: AsyncSession) -> dict:
+    """Periodic pass: add rows for new events, recount ratings from user_events (repairs any
+    drift in the incremental path) and recompute progress where it can have moved"""
+    now = utcnow()
+    created = await db.execute(
+        _insert(db)(EventStats)
+        .from_select(["event_id"], select(Event.id).where(~exists().where(EventStats.event_id == Event.id)))
+        .on_conflict_do_nothing()
+    )
+
+    def ratings(aggregate):
+        return select(aggregate).where(UserEvents.event_id == EventStats.event_id).scalar_subquery()
+
+    await db.execute(
+        update(EventStats).values(
+            rating_count=ratings(func.count(UserEvents.rating)),
+            rating_sum=ratings(func.coalesce(func.sum(UserEvents.rating), 0)),
+            avg_rating=ratings(func.avg(UserEvents.rating)),
+            refreshed_at=now,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    # Running events, plus finished or not yet started ones whose stored value is off
+    result = await db.execute(
+        select(Event.id, Event.start_date, Event.end_date, EventStats.progress)
+        .join(EventStats, EventStats.event_id == Event.id)
+        .where(or_(
+            and_(Event.start_date <= now, or_(EventStats.progress < 100, Event.end_date > now)),
+            and_(Event.start_date > now, EventStats.progress > 0),
+        ))
+    )
+    changes = [
+        {"event_id": event_id, "progress": progress}
+        for event_id, start_date, end_date, stored in result
+        if (progress := event_progress(start_date, end_date, now)) != stored
+    ]
+    if changes:
+        await db.execute(update(EventStats), changes)
+    await db.commit()
+    return {"created": created.rowcount, "progress_updated": len(changes)}
@@ -1,5 +1,6 @@
 from fastapi import HTTPException, status
-from core.database import Session
+from sqlalchemy import select, or_
+from core.database import AsyncSession
 from datetime import datetime
 from models.models import User
 from middleware.auth_middleware import AuthService
@@ -12,27 +13,29 @@ from middleware.auth_middleware import AuthService
 
 
 # CRUD Operations
-def get_user(db: Session, username: str):
-    return db.query(User).filter(User.username == username).first()
+async def get_user(db: AsyncSession, username: str):
+    result = await db.execute(select(User).where(User.username == username))
+    return result.scalars().first()
 
 # CRUD Operations
-def get_user_by_id(db: Session, id: int):
-    return db.query(User).filter(User.id == id).first()
-
-def check_unique(db: Session, username: str, email: str):
-    name_check = db.query(User).filter(User.username == username).first()
-    email_check = db.query(User).filter(User.email == email).first()
-    if name_check or email_check:
+async def get_user_by_id(db: AsyncSession, id: int):
+    return await db.get(User, id)
+
+async def check_unique(db: AsyncSession, username: str, email: str):
+    result = await db.execute(
+        select(User.id).where(or_(User.username == username, User.email == email)).limit(1)
+    )
+    if result.first():
         return False
     return True
 
 
-def delete_user(db: Session, username: str):
-    db_user = db.query(User).filter(User.username == username).first()
+async def delete_user(db: AsyncSession, username: str):
+    db_user = await get_user(db, username)
     if not db_user:
         return None
-    
+
     db_user.is_active = False  # Soft delete
-    db.commit()
+    await db.commit()
     return db_user
 
@@ -1,5 +1,87 @@
+"""Server entrypoint, run from the repo root (templates and static resolve against it).
+
+    python app/main.py                 single process with the reloader, for development
+    python app/main.py --production    multi-worker server tuned through the SERVER_* settings
+
+In production the tables and the super admin are set up once here, before the workers
+start, instead of at every worker's startup. More than one worker needs CACHE_BACKEND=redis,
+the memory cache can't see invalidations made by the other workers.
+"""
+import argparse
+import asyncio
+import logging
+import os
 import uvicorn
+from dotenv import load_dotenv
+
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", 8000))
+# Every worker has its own DB pool (DB_POOL_SIZE + DB_MAX_OVERFLOW) and job worker, size
+# the database's max_connections for workers * that
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", os.cpu_count() or 1))
+# Above the idle timeout of the proxy in front, or it reuses connections we already closed
+SERVER_KEEPALIVE = int(os.getenv("SERVER_KEEPALIVE", 75))
+SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", 2048))
+# How long SIGTERM waits for in flight requests before the lifespan shutdown (which gives
+# running jobs JOBS_SHUTDOWN_TIMEOUT of its own)
+SERVER_GRACEFUL_TIMEOUT = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", 30))
+SERVER_LIMIT_CONCURRENCY = int(os.getenv("SERVER_LIMIT_CONCURRENCY", 0)) or None  # 503 beyond it
+SERVER_FORWARDED_ALLOW_IPS = os.getenv("SERVER_FORWARDED_ALLOW_IPS", "127.0.0.1")
+SERVER_LOG_LEVEL = os.getenv("SERVER_LOG_LEVEL", "info")
+
+
+def installed(module: str) -> bool:
+    try:
+        __import__(module)
+    except ImportError:
+        logger.warning(f"{module} not installed, falling back to the pure python implementation")
+        return False
+    return True
+
+
+def serve_production(workers: int) -> None:
+    from core.database import engine
+    from services.cache import CACHE_BACKEND
+    from services.services import bootstrap_database
+
+    if workers > 1 and CACHE_BACKEND != "redis":
+        # The memory cache is per process, a write in one worker wouldn't invalidate the others
+        raise SystemExit(f"{workers} workers need CACHE_BACKEND=redis, or run with --workers 1")
+
+    asyncio.run(bootstrap_database())
+    engine.dispose()  # the workers open their own connections
+    # Inherited by the worker processes, their startup skips what was just done
+    os.environ["DB_BOOTSTRAP"] = "false"
+    uvicorn.run(
+        "config:app",
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host=SERVER_HOST,
+        port=SERVER_PORT,
+        workers=workers,
+        # uvloop isn't available on Windows
+        loop="uvloop" if installed("uvloop") else "asyncio",
+        http="httptools" if installed("httptools") else "h11",
+        timeout_keep_alive=SERVER_KEEPALIVE,
+        backlog=SERVER_BACKLOG,
+        timeout_graceful_shutdown=SERVER_GRACEFUL_TIMEOUT,
+        limit_concurrency=SERVER_LIMIT_CONCURRENCY,
+        proxy_headers=True,
+        forwarded_allow_ips=SERVER_FORWARDED_ALLOW_IPS,
+        log_level=SERVER_LOG_LEVEL,
+    )
 
 
 if __name__ == "__main__":
-    uvicorn.run('config:app', host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the API server")
+    parser.add_argument("--production", action="store_true", help="multi-worker server, no reloader")
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    args = parser.parse_args()
+    if args.production:
+        logging.basicConfig(level=logging.INFO)
+        serve_production(max(1, args.workers))
+    else:
+        uvicorn.run('config:app', host="0.0.0.0", port=8000, reload=True)
@@ -1,4 +1,10 @@
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from hashlib import sha256
+from threading import Lock
+from time import time
 from fastapi.security import HTTPBearer, OAuth2PasswordBearer
 from fastapi import Depends, HTTPException, Request, status
 import jwt
@@ -6,6 +12,7 @@ from passlib3.context import CryptContext
 from dotenv import load_dotenv
 from os import getenv
 from typing import Optional, Dict, Any, List
+from services.sessions import revocations
 
 # Load environment variables
 load_dotenv()
@@ -15,6 +22,9 @@ SECRET_KEY = getenv("SECRET_KEY")
 ALGORITHM = getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 REFRESH_TOKEN_EXPIRE_DAYS = 7
+TOKEN_CACHE_SIZE = int(getenv("TOKEN_CACHE_SIZE", 4096))
+BCRYPT_WORKERS = int(getenv("BCRYPT_WORKERS", 4))
+BCRYPT_QUEUE_DEPTH = int(getenv("BCRYPT_QUEUE_DEPTH", 32))
 
 # Initialize components
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -22,9 +32,43 @@ bearer_scheme = HTTPBearer()
 api_oauth_scheme = OAuth2PasswordBearer(tokenUrl="user")
 
 
+class HashPool:
+    """Dedicated threads for bcrypt so hashing never runs on the event loop.
+    At most workers + queue_depth calls may be running or waiting, anything beyond
+    that is refused with a 503 instead of piling up behind a login burst"""
+
+    def __init__(self, workers: int, queue_depth: int) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.limit = workers + queue_depth
+        self.inflight = 0
+        self._lock = Lock()
+
+    def _release(self, future) -> None:
+        with self._lock:
+            self.inflight -= 1
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self.inflight >= self.limit:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many concurrent logins, retry shortly",
+                    headers={"Retry-After": "1"}
+                )
+            self.inflight += 1
+        # The slot is freed when the hash finishes (or is cancelled before it starts), a
+        # cancelled request can't stop a hash already running on its thread
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+
+hash_pool = HashPool(BCRYPT_WORKERS, BCRYPT_QUEUE_DEPTH)
+
+
 class AuthService:
     @staticmethod
-    def create_access_token(user_id: int, role_id: int, expires_delta: timedelta = None) -> str:
+    def create_access_token(user_id: int, role_id: int, expires_delta: timedelta = None, sid: str = None) -> str:
         """
         Create a JWT access token.
         """
@@ -34,10 +78,12 @@ class AuthService:
             "role_id": role_id,
             "exp": datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=15))
         }
+        if sid:
+            payload["sid"] = sid
         return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
     @staticmethod
-    def create_refresh_token(user_id: int, role_id: int, expires_delta: timedelta = None) -> str:
+    def create_refresh_token(user_id: int, role_id: int, expires_delta: timedelta = None, sid: str = None) -> str:
         """
         Create a JWT refresh token.
         """
@@ -47,22 +93,26 @@ class AuthService:
             "role_id": role_id ,
             "exp": datetime.now(timezone.utc) + (expires_delta or timedelta(days=7))
         }
+        if sid:
+            payload["sid"] = sid
         return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
     @staticmethod
-    def create_tokens(user_id: int, role_id: int):
+    def create_tokens(user_id: int, role_id: int, sid: str = None):
         """
-        Create both access and refresh tokens.
+        Create both access and refresh tokens, tied to session sid when given.
         """
         access_token = AuthService.create_access_token(
             user_id,
             role_id,
-            expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+            expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+            sid=sid
         )
         refresh_token = AuthService.create_refresh_token(
             user_id,
             role_id,
-            expires_delta=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+            expires_delta=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+            sid=sid
         )
 
         return {
@@ -83,8 +133,84 @@ class AuthService:
         """
         return pwd_context.verify(plain_password, hashed_password)
 
+    @staticmethod
+    async def get_password_hash_async(password: str) -> str:
+        return await hash_pool.run(pwd_context.hash, password)
+
+    @staticmethod
+    async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+        """
+        verify_password on the bcrypt pool, for use inside async handlers.
+        """
+        return await hash_pool.run(pwd_context.verify, plain_password, hashed_password)
+
+
+
+class TokenCache:
+    """Bounded LRU of verified token claims keyed by the token's sha256 digest.
+    An entry is only served until the token's own exp, after that it is dropped and the
+    token goes through jwt.decode again (which then raises ExpiredSignatureError)"""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        payload = self._entries.get(key)
+        if payload is None:
+            self.misses += 1
+            return None
+        if payload["exp"] <= time():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return payload
+
+    def put(self, key: str, payload: Dict[str, Any]) -> None:
+        if self.maxsize <= 0 or "exp" not in payload:
+            return
+        self._entries[key] = payload
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE)
 
 
+def decode_token(token: str) -> Dict[str, Any]:
+    """jwt.decode with the signature check skipped for tokens already verified by this worker"""
+    key = sha256(token.encode()).hexdigest()
+    payload = token_cache.get(key)
+    if payload is None:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        token_cache.put(key, payload)
+    return payload
+
+
+def request_token_payload(request: Request, token: str) -> Dict[str, Any]:
+    """Claims for token, decoded at most once per request and shared through request.state"""
+    if getattr(request.state, "token", None) == token:
+        return request.state.token_payload
+    payload = decode_token(token)
+    request.state.token = token
+    request.state.token_payload = payload
+    return payload
+
 
 async def auth_middleware(request: Request, call_next):
     """
@@ -97,7 +223,7 @@ async def auth_middleware(request: Request, call_next):
         # Validate access token from Authorization header
         if "Authorization" in request.headers:
             token = request.headers["Authorization"].split(" ")[1]
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            payload = request_token_payload(request, token)
             request.state.user_id = payload.get("sub")
             request.state.token_type = payload.get("token_type")
 
@@ -105,9 +231,9 @@ async def auth_middleware(request: Request, call_next):
         # Attempt to refresh the access token using the refresh token
         if refresh_token:
             try:
-                payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
-                if payload.get("token_type") == "refresh":
-                    new_access_token = AuthService.create_access_token(payload.get("sub"))
+                payload = decode_token(refresh_token)
+                if payload.get("token_type") == "refresh" and payload.get("sid") not in revocations:
+                    new_access_token = AuthService.create_access_token(payload.get("sub"), payload.get("role_id"), sid=payload.get("sid"))
                     request.state.user_id = payload.get("sub")
                     request.state.token_type = "access"
             except jwt.PyJWTError:
@@ -126,15 +252,16 @@ async def auth_middleware(request: Request, call_next):
     return response
 
 
-async def get_current_user(token: str = Depends(api_oauth_scheme)) -> Dict[str, Any]:
+async def get_current_user(request: Request, token: str = Depends(api_oauth_scheme)) -> Dict[str, Any]:
     """
     Dependency to get the current user from the JWT token.
+    Reuses the claims auth_middleware already decoded for this request.
     """
     try:
         if not token:
             raise HTTPException(status_code=401, detail="No auth token, access denied")
 
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = request_token_payload(request, token)
         user_id = payload.get("sub")
         role_id = payload.get("role_id")
         token_type = payload.get("token_type")
@@ -142,12 +269,16 @@ async def get_current_user(token: str = Depends(api_oauth_scheme)) -> Dict[str,
 
         if not user_id or token_type != "access":
             raise HTTPException(status_code=401, detail="Invalid token")
+        # In-memory set, no query per request
+        if payload.get("sid") in revocations:
+            raise HTTPException(status_code=401, detail="Session revoked")
 
         return {
             "user_id": user_id,
             "role_id": role_id,
             "token_type": token_type,
-            "exp": exp
+            "exp": exp,
+            "sid": payload.get("sid")
         }
 
     except jwt.ExpiredSignatureError:
@@ -0,0 +1,77 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from hashlib import sha1
+from typing import Optional
+from fastapi import Request, Response
+
+
+def make_etag(data: bytes) -> str:
+    """Strong validator for a response body"""
+    return f'"{sha1(data).hexdigest()}"'
+
+
+def version_etag(*parts) -> str:
+    """Validator for a row from cheap version columns (id, updated_at, ...),
+    so it can be checked before the full object is loaded and serialized"""
+    return make_etag(":".join(str(part) for part in parts).encode())
+
+
+def http_date(moment: datetime) -> str:
+    if moment.tzinfo is None:  # DateTime columns come back naive, they hold utc
+        moment = moment.replace(tzinfo=timezone.utc)
+    return format_datetime(moment.astimezone(timezone.utc), usegmt=True)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """If-None-Match wins over If-Modified-Since, as in RFC 9110"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        # HTTP dates have second precision
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def validators(etag: str, last_modified: Optional[datetime] = None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def conditional_response(
+    request: Request,
+    body: bytes,
+    etag: str,
+    last_modified: Optional[datetime] = None,
+    media_type: str = "application/json"
+) -> Response:
+    """200 with validators, or a bodyless 304 when the client's copy is current"""
+    headers = validators(etag, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def check_not_modified(
+    request: Request,
+    response: Response,
+    etag: str,
+    last_modified: Optional[datetime] = None
+) -> Optional[Response]:
+    """For handlers that keep their normal return path: puts the validators on the
+    injected response and hands back a 304 to return early when the client is current"""
+    headers = validators(etag, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,47 @@
+from time import perf_counter
+from core.metrics import (
+    RequestMetrics, current_request, http_requests, http_latency, http_in_flight, http_response_size,
+    db_request_queries, db_request_time,
+)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, no BaseHTTPMiddleware task and body buffering on the hot path.
+    Latency runs until the last body chunk is sent, so streamed responses count in full.
+    Labels use the matched route template, which the router writes into the scope"""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = RequestMetrics(scope)
+        token = current_request.set(request)
+        status = 500  # what the client gets if the app raises before starting a response
+        size = 0
+
+        async def send_wrapper(message) -> None:
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        http_in_flight.inc()
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = perf_counter() - start
+            http_in_flight.dec()
+            current_request.reset(token)
+            method, route = scope["method"], request.route
+            http_requests.inc(method, route, str(status))
+            http_latency.observe(elapsed, method, route)
+            http_response_size.observe(size, method, route)
+            db_request_queries.observe(request.queries, route)
+            db_request_time.observe(request.query_seconds, route)
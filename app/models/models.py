@@ -1,23 +1,57 @@
 from datetime import datetime
 from sqlalchemy import (
     Column, Integer, String, Text, Boolean, ForeignKey, DateTime, 
-    Index, CheckConstraint, UniqueConstraint, JSON, Table,
+    Index, CheckConstraint, UniqueConstraint, JSON, Table, Float, SmallInteger,
 )
 from sqlalchemy.orm import relationship, backref
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, literal_column
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime, timezone
 
 Base = declarative_base()
 
 
+def search_document(subject, description):
+    """tsvector over an event's subject and description. The GIN index and the search query
+    both build it here so Postgres can match the indexed expression. 'simple' config since
+    there is no Persian stemmer, literals are inlined for the same reason"""
+    text = func.coalesce(subject, literal_column("''")).concat(literal_column("' '")).concat(
+        func.coalesce(description, literal_column("''"))
+    )
+    return func.to_tsvector(literal_column("'simple'"), text)
+
+
+class utc_timestamp(FunctionElement):
+    """Current naive utc as a server default, for rows inserted outside the ORM"""
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utc_timestamp, "postgresql")
+def _pg_utc_timestamp(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+@compiles(utc_timestamp)
+def _utc_timestamp(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"  # utc on sqlite
+
+
+def utcnow() -> datetime:
+    """Naive utc for the DateTime (timestamp without time zone) columns, asyncpg rejects aware values there"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 
 class User(Base):
     __tablename__ = 'users'
     
     id = Column(Integer, primary_key=True)
     username = Column(String, unique=True, nullable=False)
+    email = Column(String, unique=True)  # where event notifications go, optional
     password = Column(String, nullable=False)
     name = Column(String(20), nullable=False)
     lname = Column(String(20), nullable=False)
@@ -28,15 +62,14 @@ class User(Base):
     department_id = Column(Integer, ForeignKey('departments.id'))
     major = Column(String)
     birth_date = Column(DateTime)
-    role_id = Column(Integer, ForeignKey('roles.id'))
-    access_token = Column(Text)
-    refresh_token = Column(Text)
+    role_id = Column(Integer, ForeignKey('roles.id'), index=True)
     last_login = Column(DateTime)
     birth_city = Column(String)
     degree = Column(String)
     phone_number = Column(String(11), CheckConstraint("phone_number LIKE '0%'"), nullable=False)
     address = Column(String(100))
-    created_at = Column(DateTime, default=datetime.now(timezone.utc), nullable=False)
+    created_at = Column(DateTime, default=utcnow, nullable=False)
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow, nullable=False, server_default=utc_timestamp())  # version for conditional GETs
     status = Column(Boolean, default=True)
     
     university = relationship("University")
@@ -53,13 +86,33 @@ class Event(Base):
     description = Column(Text)
     text = Column(Text)
     start_date = Column(DateTime)
-    end_date = Column(DateTime)
+    end_date = Column(DateTime, index=True)
     code = Column(String)
-    created_at = Column(DateTime, default=datetime.now(timezone.utc))
+    teacher_name = Column(String(50))
+    capacity = Column(Integer)  # None for no limit
+    enrolled_count = Column(Integer, nullable=False, default=0, server_default="0")  # kept in step with user_events by join/leave
+    created_at = Column(DateTime, default=utcnow)
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow, nullable=False, server_default=utc_timestamp())  # version for conditional GETs, images included
     
     images = relationship("EventImage", back_populates="event")
     users = relationship("User", secondary="user_events", back_populates="events", overlaps="events")
 
+    __table_args__ = (
+        # Last line of defence against overbooking, join's conditional update normally keeps it
+        CheckConstraint(
+            "enrolled_count >= 0 AND (capacity IS NULL OR enrolled_count <= capacity)",
+            name="ck_events_enrollment",
+        ),
+        # Backs keyset pagination of the event listing
+        Index("ix_events_start_date_id", "start_date", "id"),
+        # Full text search, postgres only, sqlite falls back to ilike
+        Index(
+            "ix_events_search_fts",
+            search_document(subject, description),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+    )
+
 class University(Base):
     __tablename__ = 'universities'
     
@@ -89,13 +142,35 @@ class UserEvents(Base):
     __tablename__ = 'user_events'
     
     user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
-    event_id = Column(Integer, ForeignKey("events.id"), primary_key=True)
+    # The primary key only serves lookups by user_id, this covers "who joined event X"
+    event_id = Column(Integer, ForeignKey("events.id"), primary_key=True, index=True)
+    rating = Column(SmallInteger)  # 1-5, set by the participant
+
+    __table_args__ = (
+        CheckConstraint("rating BETWEEN 1 AND 5", name="ck_user_events_rating"),
+    )
+
+
+class EventStats(Base):
+    """Per-event aggregates the listing reads with one join. Ratings are applied incrementally
+    as they are written, progress (elapsed share of start_date..end_date) and a recount of the
+    ratings come from the periodic event_stats_refresh job. Participants are Event.enrolled_count,
+    kept on the events row that join already locks"""
+    __tablename__ = 'event_stats'
+
+    event_id = Column(Integer, ForeignKey('events.id', ondelete="CASCADE"), primary_key=True)
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    avg_rating = Column(Float)
+    progress = Column(Integer, nullable=False, default=0, server_default="0")  # percent
+    refreshed_at = Column(DateTime)
 
 class UserImage(Base):
     __tablename__ = 'user_images'
     
     user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
     avatar_url = Column(String, nullable=False)
+    variants = Column(JSON)  # {"thumb": url, ...} of the resized copies
     
     user = relationship("User", back_populates="avatar")
 
@@ -104,6 +179,46 @@ class EventImage(Base):
     
     id = Column(Integer, primary_key=True)
     image_id = Column(String, nullable=False)
-    event_id = Column(Integer, ForeignKey('events.id'))
+    event_id = Column(Integer, ForeignKey('events.id'), index=True)
+    variants = Column(JSON)  # {"thumb": url, ...} of the resized copies
     
-    event = relationship("Event", back_populates="images")
\ No newline at end of file
+    event = relationship("Event", back_populates="images")
+
+class Job(Base):
+    """Background work queued by request handlers and run by the worker tasks in services/jobs.py"""
+    __tablename__ = 'jobs'
+
+    id = Column(String(32), primary_key=True)
+    type = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, done, failed
+    payload = Column(JSON, nullable=False)
+    progress = Column(JSON)
+    result = Column(JSON)
+    error = Column(Text)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_at = Column(DateTime, nullable=False, default=utcnow)  # not picked up before this, retries back off through it
+    locked_by = Column(String(100))
+    locked_at = Column(DateTime)  # heartbeat of the worker running it
+    created_at = Column(DateTime, default=utcnow, nullable=False)
+    finished_at = Column(DateTime)
+
+    __table_args__ = (
+        # Serves the claim query: next due queued jobs of one type
+        Index("ix_jobs_claim", "type", "status", "run_at"),
+    )
+
+
+class UserSession(Base):
+    """One row per login. Tokens carry the id as their sid claim, only a hash of the refresh
+    token is stored"""
+    __tablename__ = 'sessions'
+
+    id = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), nullable=False, index=True)
+    token_hash = Column(String(64), nullable=False, unique=True)  # sha256 of the refresh token
+    device = Column(String(200))
+    ip = Column(String(45))
+    created_at = Column(DateTime, default=utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)  # batch cleanup deletes by it
+    revoked_at = Column(DateTime, index=True)  # revocation set reloads by it
@@ -1,12 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request, Response
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from typing import Optional, Literal
 from datetime import datetime
+from schemas.types import UTCDateTime
 from middleware.auth_middleware import get_admin, get_current_user
-from core.database import get_db, Session
+from core.database import get_async_db, AsyncSession
 from models.models import User, UserImage
-from services.uploader import BucketObj_2
+from middleware.conditional import check_not_modified, version_etag
+from services.uploader import presign_upload, object_sizes, perma_link, image_keys
+from services.tasks import spool_to_disk, queue_bucket_cleanup
+from services.images import is_image
+from services.jobs import enqueue, get_job, job_dict
+from services.sessions import revoke_session, revocations
 from uuid import uuid4
+import re
+from sqlalchemy import select
 from sqlalchemy.orm import joinedload
 # User Models
 class AdminBase(BaseModel):
@@ -17,7 +25,7 @@ class AdminBase(BaseModel):
     lname: str = Field(..., min_length=3, max_length=20)
     fa_name: str = Field(..., min_length=3, max_length=20)
     phone_number: str = Field(..., min_length=11, max_length=11)
-    birth_date: datetime
+    birth_date: UTCDateTime
 
 
 class AdminUpdate(AdminBase):
@@ -45,6 +53,14 @@ class UpdateAvatar(BaseModel):
     message: str
 
 
+class AvatarPresign(BaseModel):
+    format: Literal["jpg", "png", "webp"] = "jpg"
+
+
+class AvatarConfirm(BaseModel):
+    key: str
+
+
 # Auth Router
 router = APIRouter(
     prefix="/api/admin"
@@ -58,12 +74,19 @@ router = APIRouter(
         path="/get_me"
 )
 async def get_me(
+    request: Request,
+    response: Response,
     admin = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    admin_db = db.query(User).filter(User.id == admin["user_id"]).first()
+    # Only the version columns are read, a polling dashboard mostly gets 304s
+    result = await db.execute(select(User.id, User.username, User.updated_at).where(User.id == int(admin["user_id"])))
+    admin_db = result.first()
     if not admin_db:
         raise HTTPException(status_code=401, detail="Auth neededm, check credentials")
+    not_modified = check_not_modified(request, response, version_etag("user", admin_db.id, admin_db.updated_at), admin_db.updated_at)
+    if not_modified:
+        return not_modified
     return {"user_id": admin_db.id, "username": admin_db.username}
 
 
@@ -73,66 +96,101 @@ async def get_me(
 )
 async def update_current_admin(
     user_update: AdminUpdate,
-    db: Session =  Depends(get_db), 
+    db: AsyncSession =  Depends(get_async_db), 
     admin= Depends(get_current_user)
 ):
-    admin_db = db.query(User).filter(User.id == admin["user_id"]).first()
+    admin_db = await db.get(User, int(admin["user_id"]))
     for key, value in user_update.model_dump().items():
         setattr(admin_db, key, value)
 
-    db.commit()
+    await db.commit()
     return admin_db
 
 
-@router.post("/admin/upload-image", response_model=UpdateAvatar)
+@router.post("/admin/upload-image", status_code=202)
 async def upload_admin_image(
     file: UploadFile = File(...),
     admin = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    admin_db = db.query(User).filter(User.id == admin["user_id"]).first()
+    """Queues the resize and upload, the new avatar_url is in the job's result"""
+    if not is_image(file):
+        raise HTTPException(status_code=415, detail=f"{file.filename} is not an image ({file.content_type})")
+    admin_db = await db.get(User, int(admin["user_id"]))
     if not admin_db:
         raise HTTPException(status_code=404, detail="Admin not found!")
-    random = uuid4()
-    new_avatar = BucketObj_2(files=[file], save_names=[f"{random}"], destination="users")
-    new_avatar.upload_images()
-    link = new_avatar.generate_perma_links()
-    if not link:
-        return HTTPException(status_code=400, detail="avatar upload faild!")
-
-    user_image = db.query(UserImage).filter(UserImage.user_id == admin_db.id).first()
-    if not user_image:
-        new_image = UserImage(user_id = admin_db.id, avatar_url = link[0])
-        db.add(new_image)
-    else:
-        user_image.avatar_url = link[0]
-        db.add(user_image)
-    db.commit()
-    return {"avatar_url": link[0], "message": f"Admin {admin["user_id"]} image uploaded successfully"}
+    path = await spool_to_disk(file, prefix="avatar-")
+    job = enqueue(db, "avatar", {"user_id": admin_db.id, "path": path, "save_name": f"{uuid4()}"})
+    await db.commit()
+    return {"job_id": job.id, "status": job.status, "message": f"Admin {admin['user_id']} image queued"}
+
+
+
+@router.post("/admin/upload-image/presign")
+async def presign_admin_image(
+    presign_in: AvatarPresign,
+    admin = Depends(get_current_user)
+):
+    """Presigned POST for uploading the avatar straight to the bucket, confirm it afterwards"""
+    return presign_upload(f"users/{admin['user_id']}_{uuid4()}.{presign_in.format}", presign_in.format)
 
 
+@router.post("/admin/upload-image/confirm", response_model=UpdateAvatar)
+async def confirm_admin_image(
+    confirm_in: AvatarConfirm,
+    admin = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # The key must be one presign issued to this admin
+    if not re.fullmatch(rf"users/{admin['user_id']}_[0-9a-f\-]{{36}}\.(jpg|png|webp)", confirm_in.key):
+        raise HTTPException(status_code=400, detail="Key not issued for this admin")
+    size, = await object_sizes([confirm_in.key])
+    if size is None:
+        raise HTTPException(status_code=409, detail="Avatar not uploaded yet")
+
+    admin_db = await db.get(User, int(admin["user_id"]))
+    if not admin_db:
+        raise HTTPException(status_code=404, detail="Admin not found!")
+    link = perma_link(confirm_in.key)
+    user_image = await db.get(UserImage, admin_db.id)
+    if not user_image:
+        db.add(UserImage(user_id = admin_db.id, avatar_url = link))
+    elif user_image.avatar_url != link:
+        # The replaced avatar's objects are deleted once this commits
+        queue_bucket_cleanup(db, image_keys(user_image.avatar_url, user_image.variants))
+        user_image.avatar_url = link
+        user_image.variants = None
+    await db.commit()
+    return {"avatar_url": link, "message": f"Admin {admin['user_id']} image uploaded successfully"}
+
 
 @router.post(
         "/logout"
 )
 async def admin_logout(
-    db: Session=Depends(get_db),
+    db: AsyncSession=Depends(get_async_db),
     admin = Depends(get_current_user)
 ):
-    admin_db = db.query(User).filter(User.id == admin["user_id"]).first()
-    if not admin_db or admin_db.access_token == None:
+    if not admin["sid"]:
+        raise HTTPException(status_code=400, detail="Token has no session, log in again")
+    expires_at = await revoke_session(db, admin["sid"])
+    if not expires_at:
         raise HTTPException(status_code=404, detail="Admin not found! or logged out")
-    admin_db.access_token = None
-    admin_db.refresh_token = None
-    db.commit() 
+    await db.commit()
+    # Rejected by this worker right away, by the others on their next reload
+    revocations.add(admin["sid"], expires_at)
     return {"message": "User logged out successfully"}
 
 
 
 
 @router.get("/get_users/")
-async def get_users(db: Session = Depends(get_db)):
-    db_users = db.query(User).options(joinedload(User.avatar)).all()  # Join the UserImage (avatar) table
+async def get_users(db: AsyncSession = Depends(get_async_db)):
+    # Avatar and role come from the same joined statement, one round trip per page
+    result = await db.execute(
+        select(User).options(joinedload(User.avatar), joinedload(User.role))  # Join the UserImage (avatar) and Role tables
+    )
+    db_users = result.scalars().all()
     
     users = [
         {
@@ -144,4 +202,27 @@ async def get_users(db: Session = Depends(get_db)):
         for user in db_users
     ]
     
-    return users
\ No newline at end of file
+    return users
+
+
+@router.post("/users/import", status_code=202)
+async def import_users(
+    file: UploadFile = File(...),
+    format: Literal["csv", "jsonl"] = Form("csv"),
+    admin = Depends(get_admin),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Queue a roster import and return at once, poll /jobs/{job_id} for progress"""
+    path = await spool_to_disk(file, prefix="roster-")
+    job = enqueue(db, "roster_import", {"path": path, "format": format})
+    await db.commit()
+    return {"job_id": job.id, "status": job.status}
+
+
+@router.get("/jobs/{job_id}")
+async def get_job_status(job_id: str, admin = Depends(get_admin), db: AsyncSession = Depends(get_async_db)):
+    """Status, progress and result of a queued upload, import or email"""
+    job = await get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_dict(job)
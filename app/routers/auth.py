@@ -1,9 +1,12 @@
 from datetime import datetime, timezone
-from fastapi import APIRouter, Depends, HTTPException, status
+from uuid import uuid4
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from models.models import User
-from core.database import Session, get_db
+from sqlalchemy import select, update
+from models.models import User, utcnow
+from core.database import AsyncSession, get_async_db
 from middleware.auth_middleware import get_current_user, get_admin, AuthService, ACCESS_TOKEN_EXPIRE_MINUTES
+from services.sessions import new_session
 
 router = APIRouter(
     prefix="/api/auth/admin"
@@ -11,33 +14,44 @@ router = APIRouter(
 
 @router.post(path="/login",
              response_model=None)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(),
-                db: Session = Depends(get_db)
+async def login(request: Request,
+                form_data: OAuth2PasswordRequestForm = Depends(),
+                db: AsyncSession = Depends(get_async_db)
 ):
     # Get user from database
-    admin_db = db.query(User).filter(User.username == form_data.username).first()
+    result = await db.execute(select(User).where(User.username == form_data.username))
+    admin_db = result.scalars().first()
     
     # Validate credentials
-    if not admin_db or not AuthService.verify_password(form_data.password, admin_db.password):
+    if not admin_db or not await AuthService.verify_password_async(form_data.password, admin_db.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials"
         )
     
-    # Get device info
-    
-    # Create tokens
+    # Create tokens, bound to a new session
 
-    tokens = AuthService.create_tokens(admin_db.id, admin_db.role_id)
+    sid = uuid4().hex
+    tokens = AuthService.create_tokens(admin_db.id, admin_db.role_id, sid=sid)
 
     
-    # Store token in database
-    admin_db.access_token = tokens["access_token"]
-    admin_db.refresh_token = tokens["refresh_token"]
-    admin_db.last_login = datetime.now()
-
-
-    db.commit()
+    # Store the session, last_login goes in the same transaction. updated_at is kept as is,
+    # it versions what get_me serves and a login doesn't change that
+    await db.execute(
+        update(User).where(User.id == admin_db.id).values(last_login=utcnow(), updated_at=User.updated_at)
+    )
+    new_session(
+        db,
+        sid=sid,
+        user_id=admin_db.id,
+        refresh_token=tokens["refresh_token"],
+        expires_at=tokens["refresh_expires"].replace(tzinfo=None),
+        device=request.headers.get("user-agent"),
+        ip=request.client.host if request.client else None
+    )
+
+
+    await db.commit()
 
 
     return {
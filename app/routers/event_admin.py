@@ -1,14 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Path
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime
-from core.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Path, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import select, insert, delete
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from sqlalchemy.orm import selectinload
+from typing import List, Optional, Literal
+from core.database import get_async_db, AsyncSession, AsyncSessionLocal
 from middleware.auth_middleware import get_current_user, get_admin, get_super_admin
-from schemas.event import EventBase, EventCreate, EventDB, EventImageBase, EventImageCreate, EventImageDB, EventUpdate
-from models.models import Event, EventImage, User
-from services.uploader import BucketObj_2
+from schemas.types import UTCDateTime
+from schemas.event import EventBase, EventCreate, EventDB, EventImageBase, EventImageCreate, EventImageDB, EventUpdate, EventImagePresign, EventImageConfirm, EventNotification
+from models.models import Event, EventImage, EventStats, User, UserEvents
+from crud.event import apply_keyset, encode_cursor, first_image_url, filter_events, touch_event, add_event_images, remove_event_images
+from services.tasks import spool_to_disk, queue_bucket_cleanup
+from services.images import is_image
+from services.jobs import enqueue
+from services.uploader import presign_upload, object_sizes, perma_link, image_keys
+from services.cache import listing_cache
+from services.bulk import iter_records, csv_line, jsonl_line, ImportReport, BULK_BATCH_SIZE, EXPORT_YIELD_PER
+from middleware.conditional import conditional_response, check_not_modified, version_etag
 from uuid import uuid4
-from random import randint, choice
+import re
 
 router = APIRouter(
     prefix="/api/admin/event"
@@ -20,54 +32,78 @@ router = APIRouter(
              dependencies=[Depends(get_admin)])
 async def create_event(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     event_in: EventBase,
     current_admin: User = Depends(get_current_user)
 ):
     """Create a new event (admin only)"""
     event_db = Event(**event_in.model_dump())
     db.add(event_db)
-    db.commit()
-    db.refresh(event_db)
+    await db.commit()
+    await db.refresh(event_db)
+    await listing_cache.invalidate()
     return event_db
 
 
-
-router = APIRouter()
-
-
-
-router = APIRouter()
-
 @router.get("/get_all/", 
             #response_model=List[dict], dependencies=[Depends(get_admin)]
             )
 async def list_events(
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
     skip: int = 0,
     limit: int = 100,
-    start_date: Optional[datetime] = None,
-    end_date: Optional[datetime] = None,
-    search: Optional[str] = None
+    start_date: Optional[UTCDateTime] = None,
+    end_date: Optional[UTCDateTime] = None,
+    search: Optional[str] = None,
+    search_mode: Literal["contains", "fulltext"] = "contains",
+    pagination: Literal["offset", "cursor"] = "offset",
+    cursor: Optional[str] = None
 ):
-    """List all events with optional filters and add dynamic fields"""
-    query = db.query(Event)
-    
-    if start_date:
-        query = query.filter(Event.start_date >= start_date)
-    if end_date:
-        query = query.filter(Event.end_date <= end_date)
-    if search:
-        query = query.filter(
-            Event.subject.ilike(f"%{search}%") |
-            Event.description.ilike(f"%{search}%")
-        )
+    """List all events with optional filters and add dynamic fields.
+    pagination=cursor pages by (start_date, id) and answers with {"items", "next_cursor"},
+    the default offset mode keeps returning a plain list from skip/limit.
+    search_mode=fulltext ranks matches on postgres (rank field, best first).
+    Responses are cached per normalized params until an event write invalidates them"""
+    if search and search_mode == "fulltext" and pagination == "cursor":
+        raise HTTPException(status_code=400, detail="Ranked search can't be combined with cursor pagination")
+
+    cache_params = {
+        "skip": skip if pagination == "offset" else None,
+        "limit": limit,
+        "start_date": start_date,
+        "end_date": end_date,
+        "search": search.strip() if search else None,
+        "search_mode": search_mode if search else None,
+        "pagination": pagination,
+        "cursor": cursor if pagination == "cursor" else None,
+    }
+    generation = await listing_cache.generation()
+    cached = await listing_cache.get(cache_params, generation)
+    if cached:
+        return conditional_response(request, cached.body, cached.etag, cached.last_modified)
+
+    query = (
+        select(Event, first_image_url(), EventStats.avg_rating, EventStats.rating_count, EventStats.progress)
+        .outerjoin(EventStats, EventStats.event_id == Event.id)
+    )
+    query = filter_events(query, start_date, end_date, search, search_mode, db.bind.dialect.name)
     
-    events = query.offset(skip).limit(limit).all()
+    if pagination == "cursor":
+        try:
+            query = apply_keyset(query, cursor, limit)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        query = query.offset(skip).limit(limit)
+
+    result = await db.execute(query)
+    rows = result.all()
     
-    # Add static values dynamically
+    # Stats come precomputed from event_stats, no aggregates per request
     response = []
-    for event in events:
+    for row in rows:
+        event, image_url = row.Event, row.image_url
         event_data = {
             "id": event.id,
             "subject": event.subject,
@@ -77,14 +113,25 @@ async def list_events(
             "end_date": event.end_date,
             "code": event.code,
             "created_at": event.created_at,
-            "teacher_name": choice(["Dr. John Doe", "Prof. Alice Smith", "Dr. Robert Brown"]),
-            "user_rate": randint(1, 5),
-            "progress": randint(0, 100),
-            "image_url": event.images[0].image_id if event.images else None  # Fetch first image if available
+            "teacher_name": event.teacher_name,
+            "capacity": event.capacity,
+            "participants": event.enrolled_count,
+            "user_rate": round(row.avg_rating, 1) if row.avg_rating is not None else None,
+            "rating_count": row.rating_count or 0,
+            "progress": row.progress or 0,
+            "image_url": image_url  # First image if available, from the listing subquery
         }
+        if "rank" in row._fields:
+            event_data["rank"] = row.rank
         response.append(event_data)
     
-    return response
+    if pagination == "cursor":
+        next_cursor = encode_cursor(rows[-1][0]) if len(rows) == limit else None
+        response = {"items": response, "next_cursor": next_cursor}
+
+    body = JSONResponse(jsonable_encoder(response)).body
+    cached = await listing_cache.set(cache_params, body, generation)
+    return conditional_response(request, cached.body, cached.etag, cached.last_modified)
 
 
 
@@ -92,11 +139,19 @@ async def list_events(
 @router.get("/get/{event_id}", response_model=EventDB,
             dependencies=[Depends(get_admin)])
 async def get_event(
+    request: Request,
+    response: Response,
     event_id: int = Path(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get a specific event by ID"""
-    event = db.query(Event).filter(Event.id == event_id).first()
+    """Get a specific event by ID, answers If-None-Match with 304 before loading the event"""
+    version = (await db.execute(select(Event.updated_at).where(Event.id == event_id))).first()
+    if not version:
+        raise HTTPException(status_code=404, detail="Event not found")
+    not_modified = check_not_modified(request, response, version_etag("event", event_id, version.updated_at), version.updated_at)
+    if not_modified:
+        return not_modified
+    event = await db.get(Event, event_id, options=[selectinload(Event.images)])
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     return event
@@ -105,13 +160,13 @@ async def get_event(
             dependencies=[Depends(get_admin)])
 async def update_event(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     event_id: int,
     event_in: EventUpdate,
     #current_admin: User = Depends(get_admin)
 ):
     """Update an event (admin only)"""
-    event = db.query(Event).filter(Event.id == event_id).first()
+    event = await db.get(Event, event_id, options=[selectinload(Event.images)])
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     
@@ -120,79 +175,232 @@ async def update_event(
         setattr(event, field, value)
     
     db.add(event)
-    db.commit()
-    db.refresh(event)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # ck_events_enrollment checks against the live count, not the one read above
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Capacity is below the number of enrolled students")
+    await listing_cache.invalidate()
     return event
 
-@router.delete("delete/{event_id}",
+@router.delete("/delete/{event_id}",
                dependencies=[Depends(get_admin)])
 async def delete_event(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     event_id: int,
     #current_admin: User = Depends(get_admin)
 ):
-    """Delete an event (admin only)"""
-    event = db.query(Event).filter(Event.id == event_id).first()
+    """Delete an event with its images and enrollments (admin only). The images' bucket
+    objects are removed by a bucket_cleanup job that only runs if this commits"""
+    event = await db.get(Event, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     
-    db.delete(event)
-    db.commit()
-    return {"message": "Event deleted successfully"}
+    # Set based deletes, db.delete would load both collections just to unlink them
+    removed = await remove_event_images(db, event_id)
+    await db.execute(delete(UserEvents).where(UserEvents.event_id == event_id).execution_options(synchronize_session=False))
+    await db.execute(delete(Event).where(Event.id == event_id).execution_options(synchronize_session=False))
+    queue_bucket_cleanup(db, [key for image in removed for key in image_keys(image.image_id, image.variants)])
+    await db.commit()
+    await listing_cache.invalidate()
+    return {"message": "Event deleted successfully", "images_removed": len(removed)}
 
 # Event Image Routes
-@router.post("add/{event_id}/images",
+@router.post("/add/{event_id}/images",
               response_model=None,
              dependencies=[Depends(get_admin)])
 async def upload_event_image(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     event_id: int,
     files: List[UploadFile] = File(...),
     current_admin: User = Depends(get_admin)
 ):
-    """Upload an image for an event (admin only)"""
-    event = db.query(Event).filter(Event.id == event_id).first()
+    """Upload images for an event (admin only). Resizing and the bucket upload run as an
+    event_images job, the response carries its id"""
+    for file in files:
+        if not is_image(file):
+            raise HTTPException(status_code=415, detail=f"{file.filename} is not an image ({file.content_type})")
+    event = await db.get(Event, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     
-    # Save file and get image ID
-    save_names = [f"{event_id}_{str(uuid4())}" for _ in range(len(files))]
-    images = BucketObj_2(files= files, save_names=save_names, destination="events", format_="jpg")
-    images.upload_images()
-    links = images.generate_perma_links()
-    
-    # Create image record
-    for link in links:
-        event_image = EventImage(
-            image_id=link,
-            event_id=event_id
-        )
-        db.add(event_image)
-        db.commit()
-        db.refresh(event_image)
-    return {"event_id": event_id, "new_images": len(links)}
+    files_in = [
+        {"path": await spool_to_disk(file, prefix=f"event-{event_id}-"), "save_name": f"{event_id}_{str(uuid4())}"}
+        for file in files
+    ]
+    job = enqueue(db, "event_images", {"event_id": event_id, "files": files_in})
+    await db.commit()
+    return JSONResponse(status_code=202, content={"event_id": event_id, "job_id": job.id, "status": job.status})
+
+@router.post("/{event_id}/images/presign",
+             dependencies=[Depends(get_admin)])
+async def presign_event_images(
+    *,
+    db: AsyncSession = Depends(get_async_db),
+    event_id: int,
+    request_in: EventImagePresign
+):
+    """Presigned POSTs for uploading event images straight to the bucket (admin only).
+    Files uploaded this way skip the resize pipeline, confirm them afterwards"""
+    event = await db.get(Event, event_id)
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    uploads = [
+        presign_upload(f"events/{event_id}_{uuid4()}.{request_in.format}", request_in.format)
+        for _ in range(request_in.count)
+    ]
+    return {"event_id": event_id, "uploads": uploads}
+
+@router.post("/{event_id}/images/confirm",
+             dependencies=[Depends(get_admin)])
+async def confirm_event_images(
+    *,
+    db: AsyncSession = Depends(get_async_db),
+    event_id: int,
+    confirm_in: EventImageConfirm
+):
+    """Record presigned uploads as event images once the objects exist (admin only)"""
+    event = await db.get(Event, event_id)
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    # Only keys shaped like the ones presign hands out for this event can be claimed
+    key_pattern = re.compile(rf"events/{event_id}_[0-9a-f\-]{{36}}\.(jpg|png|webp)")
+    invalid = [key for key in confirm_in.keys if not key_pattern.fullmatch(key)]
+    if invalid:
+        raise HTTPException(status_code=400, detail={"message": "Keys not issued for this event", "keys": invalid})
+    sizes = await object_sizes(confirm_in.keys)
+    missing = [key for key, size in zip(confirm_in.keys, sizes) if size is None]
+    if missing:
+        raise HTTPException(status_code=409, detail={"message": "Objects not uploaded yet", "keys": missing})
+
+    links = {perma_link(key) for key in confirm_in.keys}
+    # Confirming twice must not duplicate rows
+    existing = await db.execute(select(EventImage.image_id).where(EventImage.image_id.in_(links)))
+    new_links = links - set(existing.scalars().all())
+    image_ids = await add_event_images(db, event_id, [{"image_id": link} for link in sorted(new_links)])
+    await touch_event(db, event_id)
+    await db.commit()
+    await listing_cache.invalidate()
+    return {"event_id": event_id, "new_images": len(image_ids), "image_ids": image_ids}
 
 @router.delete("/{event_id}/images/{image_id}",
                dependencies=[Depends(get_admin)])
 async def delete_event_image(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     event_id: int,
     image_id: int,
     current_admin: User = Depends(get_current_user)
 ):
-    """Delete an event image (admin only)"""
-    image = db.query(EventImage).filter(
-        EventImage.id == image_id,
-        EventImage.event_id == event_id
-    ).first()
-    
-    if not image:
+    """Delete an event image (admin only), its bucket objects go once this commits"""
+    removed = await remove_event_images(db, event_id, [image_id])
+    if not removed:
         raise HTTPException(status_code=404, detail="Image not found")
     
-    db.delete(image)
-    db.commit()
+    image, = removed
+    queue_bucket_cleanup(db, image_keys(image.image_id, image.variants))
+    await touch_event(db, event_id)
+    await db.commit()
+    await listing_cache.invalidate()
     return {"message": "Image deleted successfully"}
 
+
+@router.post("/{event_id}/notify",
+             status_code=202,
+             dependencies=[Depends(get_admin)])
+async def notify_participants(
+    *,
+    db: AsyncSession = Depends(get_async_db),
+    event_id: int,
+    notification_in: EventNotification
+):
+    """Email everyone registered for the event (admin only), sent by an event_notification job"""
+    event = await db.get(Event, event_id)
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    job = enqueue(db, "event_notification", {"event_id": event_id, **notification_in.model_dump()})
+    await db.commit()
+    return {"event_id": event_id, "job_id": job.id, "status": job.status}
+
+
+# Bulk import / export
+EXPORT_FIELDS = ["id", "subject", "description", "text", "start_date", "end_date", "code", "teacher_name", "capacity", "created_at"]
+
+@router.post("/import",
+             dependencies=[Depends(get_admin)])
+async def import_events(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    format: Literal["csv", "jsonl"] = "jsonl"
+):
+    """Create events from a streamed CSV (with header) or JSONL body (admin only).
+    Rows are validated with EventBase and inserted BULK_BATCH_SIZE at a time, one
+    transaction per batch. Bad rows are reported by row number and don't stop the import"""
+    report = ImportReport()
+    batch, batch_rows = [], []
+
+    async def flush():
+        try:
+            await db.execute(insert(Event).values(batch))
+            await db.commit()
+            report.inserted += len(batch)
+        except SQLAlchemyError as e:
+            await db.rollback()
+            for row in batch_rows:
+                report.error(row, f"batch insert failed: {getattr(e, 'orig', e)}")
+        batch.clear()
+        batch_rows.clear()
+
+    async for row, record in iter_records(request.stream(), format):
+        report.rows += 1
+        if isinstance(record, Exception):
+            report.error(row, record)
+            continue
+        try:
+            event_in = EventBase.model_validate(record)
+        except ValidationError as e:
+            report.error(row, e.errors(include_url=False, include_context=False, include_input=False))
+            continue
+        batch.append(event_in.model_dump())
+        batch_rows.append(row)
+        if len(batch) >= BULK_BATCH_SIZE:
+            await flush()
+    if batch:
+        await flush()
+
+    if report.inserted:
+        await listing_cache.invalidate()
+    return report.as_dict()
+
+@router.get("/export",
+            dependencies=[Depends(get_admin)])
+async def export_events(
+    format: Literal["csv", "jsonl"] = "jsonl"
+):
+    """Stream every event as CSV or JSONL (admin only). Rows come from a server-side
+    cursor EXPORT_YIELD_PER at a time, so memory stays flat however many events exist"""
+    async def lines():
+        # The request's session is closed before a streamed body is sent, use a dedicated one
+        async with AsyncSessionLocal() as session:
+            result = await session.stream(
+                select(*(getattr(Event, field) for field in EXPORT_FIELDS))
+                .order_by(Event.id)
+                .execution_options(yield_per=EXPORT_YIELD_PER)
+            )
+            if format == "csv":
+                yield csv_line(EXPORT_FIELDS)
+            async for partition in result.partitions():
+                if format == "csv":
+                    yield "".join(csv_line(row) for row in partition)
+                else:
+                    yield "".join(jsonl_line(dict(row._mapping)) for row in partition)
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        lines(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="events.{format}"'}
+    )
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, Query
+from typing import Literal
+from core.database import pool_status
+from core.profiler import profile
+from middleware.auth_middleware import get_super_admin, token_cache
+from services.jobs import queue_stats
+from services.smtp import mailer
+from services.sessions import revocations
+
+router = APIRouter(
+    prefix="/api/internal",
+    dependencies=[Depends(get_super_admin)]
+)
+
+
+@router.get("/stats/pool")
+async def get_pool_stats():
+    """Connection pool counters for the sync and async engines of this worker"""
+    return pool_status()
+
+
+@router.get("/stats/auth")
+async def get_auth_stats():
+    """Hit rate of this worker's verified token cache and size of its revocation set"""
+    return {"token_cache": token_cache.stats(), "revocations": revocations.stats()}
+
+
+@router.get("/stats/jobs")
+async def get_job_stats():
+    """Job counts by type and status, across all workers"""
+    return {"jobs": await queue_stats()}
+
+
+@router.get("/stats/mail")
+async def get_mail_stats():
+    """SMTP pool counters of this worker"""
+    return {"mailer": mailer.status()}
+
+
+@router.get("/stats/sql")
+async def get_sql_stats(
+    limit: int = Query(20, ge=1, le=500),
+    order: Literal["total", "calls", "max"] = "total"
+):
+    """Top statement fingerprints and N+1 patterns seen by this worker's SQL profiler
+    (SQL_PROFILER_ENABLED), routes are where they ran"""
+    return profile.top(limit, order)
+
+
+@router.delete("/stats/sql")
+async def reset_sql_stats():
+    profile.reset()
+    return {"message": "SQL profile reset"}
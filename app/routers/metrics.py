@@ -0,0 +1,22 @@
+import os
+from secrets import compare_digest
+from dotenv import load_dotenv
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from core.metrics import registry
+
+
+load_dotenv()
+
+# Scrapers can't log in, with a token set they send it as a bearer token instead
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics(request: Request):
+    """Prometheus metrics of this worker process, scrape every worker (or use one per container)"""
+    if METRICS_TOKEN and not compare_digest(request.headers.get("authorization", ""), f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
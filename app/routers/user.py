@@ -2,28 +2,14 @@ from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from pydantic import BaseModel, EmailStr, Field
 from typing import Optional
 from datetime import datetime
-from core.database import get_db, Session
-from models.models import User
+from core.database import get_db, Session, get_async_db, AsyncSession
+from middleware.auth_middleware import get_current_user
+from sqlalchemy import select, update
+from models.models import User, Event, UserEvents
+from crud.event import take_seat, release_seat, add_participant, remove_participant, record_rating
+from schemas.event import EventRating
+from schemas.user import UserBase
 # User Models
-class UserBase(BaseModel):
-    username: str = Field(..., min_length=4, max_length=20)
-    password: str = Field(..., min_length=8, max_length=100)
-    name: Optional[str] = Field(None, max_length=50)
-    sid: str = Field(..., min_length=11, max_length=11)
-    lname: str = Field(..., min_length=3, max_length=20)
-    fa_name: str = Field(..., min_length=3, max_length=20)
-    phone_number: str = Field(..., pattern=r"^09[\d]{9}$")
-    birth_date: datetime
-    id_number: str = Field(..., pattern=r"^[\d]{10}$")
-    university_id: int = Field(1, ge=1)
-    department_id: int = Field(1, ge=1)
-    major: str = Field(description="رشته")
-    degree: str = Field(description="مدرک")
-    address: str
-    birth_city: str
-
-
-
 class UserCreate(UserBase):
     id: int
     created_at: datetime
@@ -56,6 +42,8 @@ router = APIRouter(
 def register(user: UserBase, db: Session = Depends(get_db)):
     if db.query(User).filter(User.username == user.username).first():
         raise HTTPException (status_code=409, detail="username already exists")
+    if user.email and db.query(User).filter(User.email == user.email).first():
+        raise HTTPException (status_code=409, detail="email already exists")
     new_user = user.model_dump()
     db_user = User(**new_user)
     db_user.role_id = 1
@@ -82,12 +70,66 @@ def upload_profile(file: UploadFile = File(...)):
     return {"filename": file.filename, "message": "Profile picture uploaded successfully"}
 
 @router.post("/join-event/{event_id}")
-def join_event(event_id: int, user_id: int):
-    return {"message": f"User {user_id} joined event {event_id}"}
+async def join_event(
+    event_id: int,
+    user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    seats = await take_seat(db, event_id)
+    if not seats:
+        await db.rollback()
+        if not await db.get(Event, event_id):
+            raise HTTPException(status_code=404, detail="Event not found")
+        raise HTTPException(status_code=409, detail="Event is full")
+    if not await add_participant(db, event_id, int(user["user_id"])):
+        await db.rollback()  # hands the seat back
+        raise HTTPException(status_code=409, detail="Already joined this event")
+    await db.commit()
+    return {
+        "message": f"User {user['user_id']} joined event {event_id}",
+        "enrolled_count": seats.enrolled_count,
+        "capacity": seats.capacity
+    }
 
 @router.post("/leave-event/{event_id}")
-def leave_event(event_id: int, user_id: int):
-    return {"message": f"User {user_id} left event {event_id}"}
+async def leave_event(
+    event_id: int,
+    user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    seats = await release_seat(db, event_id)
+    enrollment = await remove_participant(db, event_id, int(user["user_id"])) if seats else None
+    if not enrollment:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Not enrolled in this event")
+    if enrollment.rating:
+        await record_rating(db, event_id, enrollment.rating, None)
+    await db.commit()
+    return {
+        "message": f"User {user['user_id']} left event {event_id}",
+        "enrolled_count": seats.enrolled_count,
+        "capacity": seats.capacity
+    }
+
+@router.post("/rate-event/{event_id}")
+async def rate_event(
+    event_id: int,
+    rating_in: EventRating,
+    user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Rate an event you joined, rating again replaces your earlier rating"""
+    enrollment = (UserEvents.event_id == event_id, UserEvents.user_id == int(user["user_id"]))
+    # Locked so two quick re-rates can't both apply the same old rating to the stats
+    result = await db.execute(select(UserEvents.rating).where(*enrollment).with_for_update())
+    row = result.first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Not enrolled in this event")
+    if row.rating != rating_in.rating:
+        await db.execute(update(UserEvents).where(*enrollment).values(rating=rating_in.rating))
+        await record_rating(db, event_id, row.rating, rating_in.rating)
+        await db.commit()
+    return {"message": f"User {user['user_id']} rated event {event_id}", "rating": rating_in.rating}
 
 @router.get("/request-resume/{user_id}")
 def request_resume(user_id: int):
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, HttpUrl, Field
-from typing import Optional, List
+from typing import Optional, List, Literal
 from datetime import datetime
+from schemas.types import UTCDateTime
 
 class EventImageBase(BaseModel):
     image_id: str
@@ -9,33 +10,53 @@ class EventImageCreate(EventImageBase):
     pass
 
 class EventImageDB(EventImageBase):
+    id: int
     event_id: int
-    new_images: int
+    variants: Optional[dict] = None
 
     class Config:
         from_attributes = True
 
+class EventImagePresign(BaseModel):
+    count: int = Field(1, ge=1, le=10)
+    format: Literal["jpg", "png", "webp"] = "jpg"
+
+class EventImageConfirm(BaseModel):
+    keys: List[str] = Field(min_length=1, max_length=10)
+
+class EventRating(BaseModel):
+    rating: int = Field(ge=1, le=5)
+
+class EventNotification(BaseModel):
+    subject: str = Field(min_length=3, max_length=200)
+    body: str = Field(min_length=1)
+
 class EventBase(BaseModel):
     subject: str = Field(min_length=3, max_length=20)
     description: Optional[str] = Field(min_length=3, max_length=50)
     text: Optional[str] = Field(max_length=300)
-    start_date: datetime
-    end_date: datetime
+    start_date: UTCDateTime
+    end_date: UTCDateTime
     code: Optional[str] = Field(max_length=20)
+    teacher_name: Optional[str] = Field(None, max_length=50)
+    capacity: Optional[int] = Field(None, ge=1)
 
 class EventCreate(EventBase):
-    created_at: datetime
+    created_at: UTCDateTime
 
 class EventUpdate(BaseModel):
     subject: Optional[str] = None
     description: Optional[str] = None
     text: Optional[str] = None
-    start_date: Optional[datetime] = None
-    end_date: Optional[datetime] = None
+    start_date: Optional[UTCDateTime] = None
+    end_date: Optional[UTCDateTime] = None
     code: Optional[str] = None
+    teacher_name: Optional[str] = Field(None, max_length=50)
+    capacity: Optional[int] = Field(None, ge=1)
 
 class EventDB(EventBase):
     id: int
+    enrolled_count: int = 0
     created_at: datetime
     images: List[EventImageDB] = []
 
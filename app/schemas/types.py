@@ -0,0 +1,15 @@
+from datetime import datetime, timezone
+from typing import Annotated, Optional
+from pydantic import AfterValidator
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Aware datetimes converted to naive utc, the DateTime columns are timestamp without time
+    zone and asyncpg rejects aware values there. Naive input is taken as utc already"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+# For request fields and query params that end up in a DateTime column or filter
+UTCDateTime = Annotated[datetime, AfterValidator(naive_utc)]
@@ -0,0 +1,21 @@
+from pydantic import BaseModel, EmailStr, Field
+from typing import Optional
+from schemas.types import UTCDateTime
+
+class UserBase(BaseModel):
+    username: str = Field(..., min_length=4, max_length=20)
+    password: str = Field(..., min_length=8, max_length=100)
+    email: Optional[EmailStr] = None
+    name: Optional[str] = Field(None, max_length=50)
+    sid: str = Field(..., min_length=11, max_length=11)
+    lname: str = Field(..., min_length=3, max_length=20)
+    fa_name: str = Field(..., min_length=3, max_length=20)
+    phone_number: str = Field(..., pattern=r"^09[\d]{9}$")
+    birth_date: UTCDateTime
+    id_number: str = Field(..., pattern=r"^[\d]{10}$")
+    university_id: int = Field(1, ge=1)
+    department_id: int = Field(1, ge=1)
+    major: str = Field(description="رشته")
+    degree: str = Field(description="مدرک")
+    address: str
+    birth_city: str
@@ -0,0 +1,115 @@
+import csv
+import io
+import json
+import os
+from datetime import date
+from typing import Any, AsyncIterator, Dict, Iterable, List, Tuple, Union
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", 500))
+BULK_MAX_ERRORS = int(os.getenv("BULK_MAX_ERRORS", 1000))
+EXPORT_YIELD_PER = int(os.getenv("EXPORT_YIELD_PER", 1000))
+
+
+# Row parsing for streamed CSV/JSONL bodies, nothing here holds more than one record
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8-sig").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8-sig").rstrip("\r")
+
+
+async def iter_jsonl(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Union[Dict[str, Any], Exception]]]:
+    row = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("each line must be a JSON object")
+            yield row, record
+        except ValueError as e:
+            yield row, e
+
+
+async def iter_csv(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Union[Dict[str, Any], Exception]]]:
+    """First line is the header. Quoted fields may span lines: a record is complete once
+    its quote count is even (escaped quotes are doubled, so they don't change parity)"""
+    header = None
+    pending = ""
+    row = 0
+    async for line in lines:
+        pending = f"{pending}\n{line}" if pending else line
+        if pending.count('"') % 2:
+            continue
+        record, pending = pending, ""
+        if not record.strip():
+            continue
+        values = next(csv.reader([record]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row += 1
+        if len(values) != len(header):
+            yield row, ValueError(f"expected {len(header)} columns, got {len(values)}")
+            continue
+        # CSV can't tell an empty string from a missing value, empty cells become None
+        yield row, {name: value if value != "" else None for name, value in zip(header, values)}
+    if pending:
+        row += 1
+        yield row, ValueError("unterminated quoted field")
+
+
+def iter_records(chunks: AsyncIterator[bytes], format_: str):
+    lines = iter_lines(chunks)
+    return iter_csv(lines) if format_ == "csv" else iter_jsonl(lines)
+
+
+def _plain(value: Any) -> Any:
+    # isoformat so exports read back through the same pydantic models
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def csv_line(values: Iterable[Any]) -> str:
+    out = io.StringIO()
+    csv.writer(out).writerow(["" if value is None else _plain(value) for value in values])
+    return out.getvalue()
+
+
+def jsonl_line(record: Dict[str, Any]) -> str:
+    return json.dumps({key: _plain(value) for key, value in record.items()}, ensure_ascii=False) + "\n"
+
+
+class ImportReport:
+    """Counts for a bulk import. Only the first BULK_MAX_ERRORS row errors are kept,
+    so a bad file can't grow memory or the response without bound"""
+
+    def __init__(self, max_errors: int = BULK_MAX_ERRORS) -> None:
+        self.max_errors = max_errors
+        self.rows = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def error(self, row: int, errors: Any) -> None:
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row, "errors": errors if isinstance(errors, list) else [str(errors)]})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed - len(self.errors),
+        }
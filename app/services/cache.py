@@ -0,0 +1,146 @@
+import json
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from hashlib import sha1
+from time import monotonic, time_ns
+from typing import Any, Dict, Optional, Tuple
+from dotenv import load_dotenv
+from middleware.conditional import make_etag
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # optional, only needed for CACHE_BACKEND=redis
+    redis = None
+
+
+load_dotenv()
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+LISTING_CACHE_TTL = int(os.getenv("LISTING_CACHE_TTL", 300))
+LISTING_CACHE_SIZE = int(os.getenv("LISTING_CACHE_SIZE", 512))
+
+
+class MemoryBackend:
+    """Per-process LRU with a ttl, the default backend. Invalidations stay in the process,
+    so it only fits a single worker. Pinned keys (the cache generations) live outside the
+    LRU: evicting one would orphan every cached page and move Last-Modified without a write"""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._pinned: Dict[str, bytes] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        if key in self._pinned:
+            return self._pinned[key]
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires and expires <= monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: Optional[int] = None, pinned: bool = False) -> None:
+        if pinned:
+            self._pinned[key] = value
+            return
+        self._entries[key] = (monotonic() + ttl if ttl else 0, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def set_if_missing(self, key: str, value: bytes) -> bytes:
+        """Pinned, only used for the generations"""
+        current = await self.get(key)
+        if current is None:
+            await self.set(key, value, pinned=True)
+            return value
+        return current
+
+
+class RedisBackend:
+    """Any Redis-compatible server, shared by all workers so invalidation is global"""
+
+    def __init__(self, url: str) -> None:
+        if redis is None:
+            raise RuntimeError("CACHE_BACKEND=redis needs the redis package installed")
+        self.client = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[int] = None, pinned: bool = False) -> None:
+        # Keys without a ttl are left alone by the volatile-* maxmemory policies
+        await self.client.set(key, value, ex=ttl)
+
+    async def set_if_missing(self, key: str, value: bytes) -> bytes:
+        await self.client.set(key, value, nx=True)
+        return await self.client.get(key)
+
+
+def make_backend():
+    if CACHE_BACKEND == "redis":
+        return RedisBackend(CACHE_REDIS_URL)
+    return MemoryBackend(LISTING_CACHE_SIZE)
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: str
+    last_modified: datetime
+
+
+class ResponseCache:
+    """Serialized responses keyed by namespace, generation and normalized params.
+    The generation is the time of the last invalidation: bumping it orphans every entry
+    at once (they age out through the ttl/LRU) and doubles as Last-Modified"""
+
+    def __init__(self, backend, namespace: str, ttl: int) -> None:
+        self.backend = backend
+        self.namespace = namespace
+        self.ttl = ttl
+
+    @property
+    def generation_key(self) -> str:
+        return f"{self.namespace}:generation"
+
+    async def generation(self) -> int:
+        value = await self.backend.set_if_missing(self.generation_key, str(time_ns()).encode())
+        return int(value)
+
+    async def invalidate(self) -> None:
+        await self.backend.set(self.generation_key, str(time_ns()).encode(), pinned=True)
+
+    @staticmethod
+    def params_digest(params: Dict[str, Any]) -> str:
+        normalized = json.dumps(params, sort_keys=True, default=str)
+        return sha1(normalized.encode()).hexdigest()
+
+    async def get(self, params: Dict[str, Any], generation: int) -> Optional[CachedResponse]:
+        value = await self.backend.get(f"{self.namespace}:{generation}:{self.params_digest(params)}")
+        if value is None:
+            return None
+        etag, _, body = value.partition(b"\n")
+        return CachedResponse(body, etag.decode(), self._as_datetime(generation))
+
+    async def set(self, params: Dict[str, Any], body: bytes, generation: int) -> CachedResponse:
+        """generation must be read before the data was queried, so a body built from rows
+        that an invalidation raced with lands under the old generation and is never served"""
+        etag = make_etag(body)
+        key = f"{self.namespace}:{generation}:{self.params_digest(params)}"
+        await self.backend.set(key, etag.encode() + b"\n" + body, self.ttl)
+        return CachedResponse(body, etag, self._as_datetime(generation))
+
+    @staticmethod
+    def _as_datetime(generation: int) -> datetime:
+        return datetime.fromtimestamp(generation / 1e9, tz=timezone.utc)
+
+
+listing_cache = ResponseCache(make_backend(), "events:listing", LISTING_CACHE_TTL)
@@ -0,0 +1,124 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Dict, List, Any, Optional
+from dotenv import load_dotenv
+from fastapi import UploadFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+load_dotenv()
+
+IMAGE_MAX_WIDTH = int(os.getenv("IMAGE_MAX_WIDTH", 1600))
+IMAGE_MAX_HEIGHT = int(os.getenv("IMAGE_MAX_HEIGHT", 1600))
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "webp").lower()
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", 82))
+# name:longest_edge pairs, e.g. "thumb:320,medium:800"
+IMAGE_VARIANTS = os.getenv("IMAGE_VARIANTS", "thumb:320,medium:800")
+IMAGE_PROCESS_WORKERS = int(os.getenv("IMAGE_PROCESS_WORKERS", 2))
+
+FORMATS = {
+    "webp": ("WEBP", "webp"),
+    "jpeg": ("JPEG", "jpg"),
+    "jpg": ("JPEG", "jpg"),
+}
+PIL_FORMAT, EXTENSION = FORMATS[IMAGE_FORMAT]
+VARIANT_SIZES = {
+    name.strip(): int(size)
+    for name, size in (pair.split(":") for pair in IMAGE_VARIANTS.split(",") if pair.strip())
+}
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Created on first use and with spawn, so forking a worker never copies the app's threads"""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=IMAGE_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_pool
+
+
+def _encode(image: Image.Image) -> bytes:
+    if PIL_FORMAT == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    out = BytesIO()
+    # No exif/icc arguments are passed, so the re-encoded file carries no metadata
+    image.save(out, format=PIL_FORMAT, quality=IMAGE_QUALITY, optimize=True)
+    return out.getvalue()
+
+
+def process_image(data: bytes) -> Dict[str, bytes]:
+    """Decode, fix orientation, strip metadata, bound to the max dimensions and re-encode.
+    Returns {"original": ..., <variant>: ...}. Runs inside the process pool"""
+    try:
+        with Image.open(BytesIO(data)) as source:
+            image = ImageOps.exif_transpose(source)
+            image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise ValueError(f"Not a readable image ({type(e).__name__})")
+
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+    image.thumbnail((IMAGE_MAX_WIDTH, IMAGE_MAX_HEIGHT), Image.LANCZOS)
+    variants = {"original": _encode(image)}
+    for name, edge in VARIANT_SIZES.items():
+        variant = image.copy()
+        variant.thumbnail((edge, edge), Image.LANCZOS)
+        variants[name] = _encode(variant)
+    return variants
+
+
+def is_image(file: UploadFile) -> bool:
+    """Checked on the request, before anything is spooled or queued. The declared type only,
+    the decode in process_image is what rejects a mislabeled file"""
+    return (file.content_type or "").startswith("image/")
+
+
+async def process_upload(file: UploadFile) -> Dict[str, bytes]:
+    data = await file.read()
+    return await asyncio.get_running_loop().run_in_executor(get_process_pool(), process_image, data)
+
+
+async def process_and_upload(files: List[UploadFile], save_names: List[str], destination: str) -> List[Dict[str, Any]]:
+    """Process every file and upload the main image plus its variants in one parallel batch.
+    One result per input file: ok, error, retry (False when the file itself is bad, e.g. not
+    an image, so another attempt would fail the same way), link (main image) and variants {name: link}"""
+    # Imported here so spawned pool workers don't build an s3 client they never use
+    from services.uploader import BucketObj_2
+
+    processed = await asyncio.gather(*(process_upload(file) for file in files), return_exceptions=True)
+
+    results, outputs, output_names = [], [], []
+    for save_name, variants in zip(save_names, processed):
+        result = {"save_name": save_name, "ok": True, "error": None, "retry": False, "link": None, "variants": {}}
+        results.append(result)
+        if isinstance(variants, Exception):
+            # process_image raises ValueError for undecodable files
+            result.update(ok=False, error=str(variants), retry=not isinstance(variants, ValueError))
+            continue
+        for name, data in variants.items():
+            outputs.append(UploadFile(BytesIO(data), size=len(data)))
+            output_names.append(save_name if name == "original" else f"{save_name}_{name}")
+
+    bucket = BucketObj_2(files=outputs, save_names=output_names, destination=destination, format_=EXTENSION)
+    uploads = {upload["save_name"]: upload for upload in await bucket.upload_images_async()}
+
+    for result in results:
+        if not result["ok"]:
+            continue
+        main = uploads[result["save_name"]]
+        result["link"] = main["link"]
+        for name in VARIANT_SIZES:
+            variant = uploads[f"{result['save_name']}_{name}"]
+            if variant["ok"]:
+                result["variants"][name] = variant["link"]
+        if not main["ok"]:
+            result.update(ok=False, error=main["error"], retry=True)
+    return results
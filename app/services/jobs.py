@@ -0,0 +1,296 @@
+import asyncio
+import logging
+import os
+import random
+import socket
+from dataclasses import dataclass
+from datetime import timedelta
+from time import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from uuid import NAMESPACE_URL, uuid4, uuid5
+from dotenv import load_dotenv
+from sqlalchemy import delete, event, func, select, update
+from sqlalchemy.exc import IntegrityError
+from core.database import AsyncSession, AsyncSessionLocal
+from models.models import Job, utcnow
+
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+JOBS_ENABLED = os.getenv("JOBS_ENABLED", "true").lower() == "true"
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", 2))
+JOBS_LEASE_SECONDS = int(os.getenv("JOBS_LEASE_SECONDS", 300))
+JOBS_BACKOFF_SECONDS = float(os.getenv("JOBS_BACKOFF_SECONDS", 10))
+JOBS_BACKOFF_MAX_SECONDS = float(os.getenv("JOBS_BACKOFF_MAX_SECONDS", 3600))
+JOBS_SHUTDOWN_TIMEOUT = float(os.getenv("JOBS_SHUTDOWN_TIMEOUT", 20))
+JOBS_KEEP_DAYS = int(os.getenv("JOBS_KEEP_DAYS", 7))
+
+
+@dataclass
+class JobType:
+    name: str
+    fn: Callable[..., Awaitable[Any]]
+    concurrency: int
+    max_attempts: int
+    every: Optional[float] = None
+
+
+_types: Dict[str, JobType] = {}
+
+
+class PermanentError(Exception):
+    """Raised by a handler for a failure another attempt can't fix, the job fails right away"""
+
+
+def handler(name: str, concurrency: int = 1, max_attempts: int = 3, every: Optional[float] = None):
+    """Register fn(ctx, payload) as the runner of a job type. concurrency caps the jobs of
+    this type running at once in one process, so a burst of one kind can't starve the rest.
+    With every (seconds) the type is also queued on that schedule, once per period cluster wide"""
+    def register(fn: Callable[..., Awaitable[Any]]):
+        _types[name] = JobType(name, fn, concurrency, max_attempts, every)
+        return fn
+    return register
+
+
+class JobContext:
+    """What a handler sees of its job"""
+
+    def __init__(self, job: Job) -> None:
+        self.id = job.id
+        self.type = job.type
+        self.attempts = job.attempts
+        self.max_attempts = job.max_attempts
+        self.progress = job.progress  # the last report(), kept across attempts
+
+    @property
+    def last_attempt(self) -> bool:
+        return self.attempts >= self.max_attempts
+
+    async def report(self, progress: Dict[str, Any]) -> None:
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(Job).where(Job.id == self.id).values(progress=progress, locked_at=utcnow()))
+            await db.commit()
+
+
+def enqueue(
+    db: AsyncSession,
+    type_: str,
+    payload: Dict[str, Any],
+    max_attempts: Optional[int] = None,
+    job_id: Optional[str] = None
+) -> Job:
+    """Add a job to the caller's session, it commits (or rolls back) with the caller's own writes.
+    Workers in this process are woken on commit, others find it on their next poll"""
+    job = Job(
+        id=job_id or uuid4().hex,
+        type=type_,
+        status="queued",
+        payload=payload,
+        attempts=0,
+        max_attempts=max_attempts or _types[type_].max_attempts,
+        run_at=utcnow(),
+    )
+    db.add(job)
+    event.listen(db.sync_session, "after_commit", lambda session: worker.wake(type_), once=True)
+    return job
+
+
+async def submit(type_: str, payload: Dict[str, Any], max_attempts: Optional[int] = None) -> Job:
+    """enqueue in a transaction of its own"""
+    async with AsyncSessionLocal() as db:
+        job = enqueue(db, type_, payload, max_attempts)
+        await db.commit()
+        return job
+
+
+async def get_job(db: AsyncSession, job_id: str) -> Optional[Job]:
+    return await db.get(Job, job_id)
+
+
+def job_dict(job: Job) -> Dict[str, Any]:
+    return {
+        "id": job.id,
+        "type": job.type,
+        "status": job.status,
+        "progress": job.progress,
+        "result": job.result,
+        "error": job.error,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "run_at": job.run_at,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
+
+
+async def queue_stats() -> Dict[str, Dict[str, int]]:
+    async with AsyncSessionLocal() as db:
+        rows = await db.execute(select(Job.type, Job.status, func.count()).group_by(Job.type, Job.status))
+    stats: Dict[str, Dict[str, int]] = {}
+    for type_, status, count in rows:
+        stats.setdefault(type_, {})[status] = count
+    return stats
+
+
+def backoff(attempts: int) -> timedelta:
+    """Exponential with jitter so jobs that failed together don't retry together"""
+    delay = min(JOBS_BACKOFF_SECONDS * 2 ** (attempts - 1), JOBS_BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.5, 1))
+
+
+class Worker:
+    """Asyncio tasks polling the jobs table, one loop per job type plus a housekeeping loop.
+    Rows are claimed with FOR UPDATE SKIP LOCKED on Postgres, so every app process can run
+    a worker without two of them taking the same job"""
+
+    def __init__(self) -> None:
+        self.id = f"{socket.gethostname()}:{os.getpid()}"
+        self._loops: List[asyncio.Task] = []
+        self._running: Dict[str, set] = {}
+        self._wakeups: Dict[str, asyncio.Event] = {}
+        self._stopping = False
+
+    def wake(self, type_: str) -> None:
+        if type_ in self._wakeups:
+            self._wakeups[type_].set()
+
+    async def start(self) -> None:
+        self._stopping = False
+        for job_type in _types.values():
+            self._running[job_type.name] = set()
+            self._wakeups[job_type.name] = asyncio.Event()
+            self._loops.append(asyncio.create_task(self._poll(job_type)))
+            if job_type.every:
+                self._loops.append(asyncio.create_task(self._schedule(job_type)))
+        self._loops.append(asyncio.create_task(self._housekeeping()))
+        logger.info(f"Job worker {self.id} started for {', '.join(_types)}")
+
+    async def stop(self) -> None:
+        """Stop claiming, give running jobs JOBS_SHUTDOWN_TIMEOUT to finish and hand the rest back to the queue"""
+        self._stopping = True
+        for loop in self._loops:
+            loop.cancel()
+        await asyncio.gather(*self._loops, return_exceptions=True)
+        self._loops.clear()
+        running = set().union(*self._running.values())
+        if running:
+            _, pending = await asyncio.wait(running, timeout=JOBS_SHUTDOWN_TIMEOUT)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(Job).where(Job.status == "running", Job.locked_by == self.id)
+                .values(status="queued", locked_by=None, locked_at=None, attempts=Job.attempts - 1)
+            )
+            await db.commit()
+
+    async def _poll(self, job_type: JobType) -> None:
+        running, wakeup = self._running[job_type.name], self._wakeups[job_type.name]
+        while not self._stopping:
+            wakeup.clear()
+            free = job_type.concurrency - len(running)
+            claimed = []
+            if free > 0:
+                try:
+                    claimed = await self._claim(job_type, free)
+                except Exception:
+                    logger.exception(f"Claiming {job_type.name} jobs failed")
+            for job in claimed:
+                task = asyncio.create_task(self._execute(job_type, job))
+                running.add(task)
+                task.add_done_callback(lambda task: (running.discard(task), wakeup.set()))
+            if claimed and len(claimed) == free:
+                continue  # there may be more due, claim again once a slot frees up
+            try:
+                await asyncio.wait_for(wakeup.wait(), JOBS_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _schedule(self, job_type: JobType) -> None:
+        """Queue one job per period. Every process tries, the id derived from the period
+        makes all but the first insert a primary key conflict"""
+        while not self._stopping:
+            period = int(time() // job_type.every)
+            try:
+                async with AsyncSessionLocal() as db:
+                    job_id = uuid5(NAMESPACE_URL, f"{job_type.name}:{period}").hex
+                    enqueue(db, job_type.name, {"period": period}, job_id=job_id)
+                    await db.commit()
+            except IntegrityError:
+                pass
+            except Exception:
+                logger.exception(f"Scheduling {job_type.name} failed")
+            await asyncio.sleep(max(0, (period + 1) * job_type.every - time()))
+
+    async def _claim(self, job_type: JobType, limit: int) -> List[Job]:
+        now = utcnow()
+        async with AsyncSessionLocal() as db:
+            due = await db.execute(
+                select(Job.id)
+                .where(Job.type == job_type.name, Job.status == "queued", Job.run_at <= now)
+                .order_by(Job.run_at)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )
+            ids = due.scalars().all()
+            if not ids:
+                return []
+            # The status check keeps the claim safe where FOR UPDATE is a no-op (sqlite)
+            await db.execute(
+                update(Job).where(Job.id.in_(ids), Job.status == "queued")
+                .values(status="running", locked_by=self.id, locked_at=now, attempts=Job.attempts + 1)
+            )
+            await db.commit()
+            claimed = await db.execute(select(Job).where(Job.id.in_(ids), Job.locked_by == self.id, Job.status == "running"))
+            return claimed.scalars().all()
+
+    async def _execute(self, job_type: JobType, job: Job) -> None:
+        ctx = JobContext(job)
+        values: Dict[str, Any]
+        try:
+            result = await job_type.fn(ctx, job.payload)
+            values = {"status": "done", "result": result, "error": None, "finished_at": utcnow()}
+        except asyncio.CancelledError:
+            raise  # shutdown, stop() puts it back in the queue
+        except Exception as e:
+            if ctx.last_attempt or isinstance(e, PermanentError):
+                logger.exception(f"Job {job.type} {job.id} failed after {ctx.attempts} attempts")
+                values = {"status": "failed", "error": str(e), "finished_at": utcnow()}
+            else:
+                logger.warning(f"Job {job.type} {job.id} attempt {ctx.attempts} failed, retrying: {e}")
+                values = {"status": "queued", "error": str(e), "run_at": utcnow() + backoff(ctx.attempts)}
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(Job).where(Job.id == job.id).values(locked_by=None, locked_at=None, **values))
+            await db.commit()
+
+    async def _housekeeping(self) -> None:
+        """Heartbeat this worker's running jobs, requeue the ones whose worker stopped
+        beating (crashed process) and drop finished jobs older than JOBS_KEEP_DAYS"""
+        while not self._stopping:
+            await asyncio.sleep(JOBS_LEASE_SECONDS / 3)
+            now = utcnow()
+            expired = now - timedelta(seconds=JOBS_LEASE_SECONDS)
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(
+                        update(Job).where(Job.status == "running", Job.locked_by == self.id).values(locked_at=now)
+                    )
+                    await db.execute(
+                        update(Job).where(Job.status == "running", Job.locked_at < expired, Job.attempts >= Job.max_attempts)
+                        .values(status="failed", error="worker lost", locked_by=None, locked_at=None, finished_at=now)
+                    )
+                    await db.execute(
+                        update(Job).where(Job.status == "running", Job.locked_at < expired)
+                        .values(status="queued", locked_by=None, locked_at=None, run_at=now)
+                    )
+                    await db.execute(
+                        delete(Job).where(Job.status == "done", Job.finished_at < now - timedelta(days=JOBS_KEEP_DAYS))
+                    )
+                    await db.commit()
+            except Exception:
+                logger.exception("Job housekeeping failed")
+
+
+worker = Worker()
@@ -0,0 +1,45 @@
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+from email.message import EmailMessage
+from dotenv import load_dotenv
+from sqlalchemy import select
+from core.database import AsyncSessionLocal
+from models.models import User, UserEvents
+from services.smtp import build_message, mailer
+
+
+load_dotenv()
+
+NOTIFY_YIELD_PER = int(os.getenv("NOTIFY_YIELD_PER", 500))
+
+
+async def participant_messages(event_id: int, subject: str, body: str) -> AsyncIterator[EmailMessage]:
+    """One message per participant with an email. Recipients are read in keyset pages of
+    NOTIFY_YIELD_PER on short sessions: the roster is never all in memory, and no connection
+    stays checked out while the rate limited sends go out"""
+    last_id = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(User.id, User.email)
+                .join(UserEvents, UserEvents.user_id == User.id)
+                .where(UserEvents.event_id == event_id, User.email.isnot(None), User.id > last_id)
+                .order_by(User.id)
+                .limit(NOTIFY_YIELD_PER)
+            )
+            page = result.all()
+        if not page:
+            return
+        for _, email in page:
+            yield build_message(subject, body, email)
+        last_id = page[-1].id
+
+
+async def notify_event_participants(
+    event_id: int,
+    subject: str,
+    body: str,
+    on_progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+) -> Dict[str, Any]:
+    report = await mailer.send_many(participant_messages(event_id, subject, body), on_progress)
+    return {"event_id": event_id, **report}
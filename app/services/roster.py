@@ -0,0 +1,164 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Set, Tuple
+from dotenv import load_dotenv
+from pydantic import ValidationError
+from sqlalchemy import or_, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.dialects import postgresql, sqlite
+from core.database import AsyncSessionLocal
+from middleware.auth_middleware import pwd_context
+from models.models import User
+from schemas.user import UserBase
+from services.bulk import iter_records, ImportReport, BULK_BATCH_SIZE
+from services.jobs import JobContext
+
+
+load_dotenv()
+
+ROSTER_HASH_WORKERS = int(os.getenv("ROSTER_HASH_WORKERS", 4))
+ROSTER_CHUNK_BYTES = 64 * 1024
+
+# Separate from the login hash pool so a big roster never queues in front of logins
+roster_hash_executor = ThreadPoolExecutor(max_workers=ROSTER_HASH_WORKERS, thread_name_prefix="roster-bcrypt")
+
+# NOT NULL columns that UserBase leaves optional (name), checked per row before the insert
+REQUIRED_FIELDS = [
+    column.name for column in User.__table__.columns
+    if not column.nullable and column.default is None and column.server_default is None
+    and column.name in UserBase.model_fields
+]
+# String column lengths UserBase allows more than (name is 50 there, 20 in the table). SQLite
+# doesn't enforce them, Postgres would fail the insert with a DataError
+FIELD_LENGTHS = {
+    column.name: column.type.length for column in User.__table__.columns
+    if getattr(column.type, "length", None) and column.name in UserBase.model_fields
+}
+
+
+class RosterReport(ImportReport):
+    def __init__(self) -> None:
+        super().__init__()
+        self.duplicates = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {**super().as_dict(), "duplicates": self.duplicates}
+
+
+async def read_chunks(path: str) -> AsyncIterator[bytes]:
+    loop = asyncio.get_running_loop()
+    with open(path, "rb") as spooled:
+        while chunk := await loop.run_in_executor(None, spooled.read, ROSTER_CHUNK_BYTES):
+            yield chunk
+
+
+def upsert_users(dialect: str):
+    """INSERT ... ON CONFLICT DO NOTHING RETURNING username. No conflict target, so rows
+    clashing on either unique column (username, email) are skipped"""
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    return insert(User).on_conflict_do_nothing().returning(User.username)
+
+
+async def insert_batch(batch: List[Tuple[int, UserBase]], report: RosterReport) -> None:
+    async with AsyncSessionLocal() as db:
+        # One set-based lookup for the whole batch instead of a query per username/email
+        names = {user.username for _, user in batch}
+        emails = {user.email for _, user in batch if user.email}
+        taken = await db.execute(
+            select(User.username, User.email).where(or_(User.username.in_(names), User.email.in_(emails)))
+        )
+        existing, existing_emails = set(), set()
+        for username, email in taken:
+            existing.add(username)
+            existing_emails.add(email)
+
+        fresh, seen, seen_emails = [], set(), set()
+        for row, user in batch:
+            if user.username in existing or user.username in seen:
+                report.duplicates += 1
+                report.error(row, f"username {user.username} already exists")
+                continue
+            if user.email and (user.email in existing_emails or user.email in seen_emails):
+                report.duplicates += 1
+                report.error(row, f"email {user.email} already exists")
+                continue
+            seen.add(user.username)
+            seen_emails.add(user.email)
+            fresh.append((row, user))
+        if not fresh:
+            return
+
+        loop = asyncio.get_running_loop()
+        hashes = await asyncio.gather(*(
+            loop.run_in_executor(roster_hash_executor, pwd_context.hash, user.password) for _, user in fresh
+        ))
+        values = [
+            {**user.model_dump(), "password": hashed, "role_id": 1}
+            for (_, user), hashed in zip(fresh, hashes)
+        ]
+        # Usernames/emails taken by a concurrent insert since the lookup are skipped by ON CONFLICT
+        failed = set()
+        try:
+            inserted = await insert_users(db, values)
+        except DBAPIError:
+            # Another constraint or a bad value failed the statement, retry row by row so
+            # only the bad rows fail
+            await db.rollback()
+            inserted = set()
+            for (row, _), value in zip(fresh, values):
+                try:
+                    inserted |= await insert_users(db, [value])
+                except DBAPIError as e:
+                    await db.rollback()
+                    failed.add(row)
+                    report.error(row, e.orig)
+
+        report.inserted += len(inserted)
+        for row, user in fresh:
+            if user.username not in inserted and row not in failed:
+                report.duplicates += 1
+                report.error(row, f"username {user.username} or email {user.email} already exists")
+
+
+async def insert_users(db, values: List[Dict[str, Any]]) -> Set[str]:
+    """Insert and commit, returns the usernames that went in"""
+    result = await db.execute(upsert_users(db.bind.dialect.name).values(values))
+    inserted = set(result.scalars())
+    await db.commit()
+    return inserted
+
+
+async def import_roster(ctx: JobContext, path: str, format_: str) -> Dict[str, Any]:
+    """roster_import job: create users from a spooled CSV/JSONL roster file, then remove it"""
+    report = RosterReport()
+    batch: List[Tuple[int, UserBase]] = []
+    try:
+        async for row, record in iter_records(read_chunks(path), format_):
+            report.rows += 1
+            if isinstance(record, Exception):
+                report.error(row, record)
+                continue
+            try:
+                user = UserBase.model_validate(record)
+            except ValidationError as e:
+                report.error(row, e.errors(include_url=False, include_context=False, include_input=False))
+                continue
+            problems = [f"{name} is required" for name in REQUIRED_FIELDS if getattr(user, name) is None]
+            problems += [
+                f"{name} is longer than {length} characters" for name, length in FIELD_LENGTHS.items()
+                if len(getattr(user, name) or "") > length
+            ]
+            if problems:
+                report.error(row, problems)
+                continue
+            batch.append((row, user))
+            if len(batch) >= BULK_BATCH_SIZE:
+                await insert_batch(batch, report)
+                batch.clear()
+                await ctx.report(report.as_dict())
+        if batch:
+            await insert_batch(batch, report)
+    finally:
+        os.remove(path)
+    return report.as_dict()
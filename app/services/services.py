@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
-from models.models import User, Role, University, Department
+from models.models import Base, User, Role, University, Department
+from core.database import engine, SessionLocal
 from middleware.auth_middleware import AuthService
 from dotenv import load_dotenv
 import os
@@ -61,4 +62,15 @@ async def initialize_super_admin(db: Session) -> None:
     except SQLAlchemyError as e:
         logger.error(f"Error creating super admin: {str(e)}")
         db.rollback()
-        raise
\ No newline at end of file
+        raise
+
+
+async def bootstrap_database() -> None:
+    """Create missing tables and seed roles, university, department and the super admin.
+    Run once per deployment (main.py does it before starting the workers), not per worker"""
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    try:
+        await initialize_super_admin(db)
+    finally:
+        db.close()
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from hashlib import sha256
+from os import getenv
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+from sqlalchemy import delete, select, update
+from core.database import AsyncSession, AsyncSessionLocal
+from models.models import UserSession, utcnow
+
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+SESSION_REVOCATION_REFRESH_SECONDS = float(getenv("SESSION_REVOCATION_REFRESH_SECONDS", 5))
+# Each reload re-reads this far back, covers revoked_at written by app servers with a clock behind ours
+SESSION_REVOCATION_OVERLAP_SECONDS = float(getenv("SESSION_REVOCATION_OVERLAP_SECONDS", 60))
+SESSIONS_CLEANUP_BATCH = int(getenv("SESSIONS_CLEANUP_BATCH", 5000))
+
+
+def token_hash(token: str) -> str:
+    return sha256(token.encode()).hexdigest()
+
+
+def new_session(
+    db: AsyncSession,
+    sid: str,
+    user_id: int,
+    refresh_token: str,
+    expires_at: datetime,
+    device: Optional[str] = None,
+    ip: Optional[str] = None
+) -> UserSession:
+    session = UserSession(
+        id=sid,
+        user_id=user_id,
+        token_hash=token_hash(refresh_token),
+        device=device[:200] if device else None,
+        ip=ip,
+        expires_at=expires_at,
+    )
+    db.add(session)
+    return session
+
+
+async def revoke_session(db: AsyncSession, sid: str) -> Optional[datetime]:
+    """Mark the session revoked, its expires_at or None if it was unknown or already revoked.
+    Add it to the revocation set once the caller has committed"""
+    result = await db.execute(
+        update(UserSession)
+        .where(UserSession.id == sid, UserSession.revoked_at.is_(None))
+        .values(revoked_at=utcnow())
+        .returning(UserSession.expires_at)
+    )
+    row = result.first()
+    return row.expires_at if row else None
+
+
+async def delete_expired_sessions() -> int:
+    """Delete expired sessions SESSIONS_CLEANUP_BATCH rows per transaction, so a large backlog
+    never holds locks or bloats one transaction"""
+    deleted = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            batch = select(UserSession.id).where(UserSession.expires_at < utcnow()).limit(SESSIONS_CLEANUP_BATCH)
+            result = await db.execute(
+                delete(UserSession).where(UserSession.id.in_(batch.scalar_subquery()))
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        deleted += result.rowcount
+        if result.rowcount < SESSIONS_CLEANUP_BATCH:
+            return deleted
+
+
+class RevocationSet:
+    """Ids of revoked, unexpired sessions held in memory, so get_current_user can turn revoked
+    tokens away without a query per request. Reloaded every SESSION_REVOCATION_REFRESH_SECONDS
+    (only rows revoked since the last reload), revocations made in this process apply at once"""
+
+    def __init__(self) -> None:
+        self._revoked: Dict[str, datetime] = {}
+        self._since: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self.reloads = 0
+
+    def __contains__(self, sid: str) -> bool:
+        return sid in self._revoked
+
+    def add(self, sid: str, expires_at: datetime) -> None:
+        self._revoked[sid] = expires_at
+
+    async def reload(self) -> None:
+        now = utcnow()
+        query = select(UserSession.id, UserSession.expires_at).where(
+            UserSession.revoked_at.isnot(None), UserSession.expires_at > now
+        )
+        if self._since:
+            query = query.where(UserSession.revoked_at >= self._since)
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(query)).all()
+        revoked = {sid: expires_at for sid, expires_at in self._revoked.items() if expires_at > now}
+        revoked.update(rows)
+        self._revoked = revoked
+        self._since = now - timedelta(seconds=SESSION_REVOCATION_OVERLAP_SECONDS)
+        self.reloads += 1
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(SESSION_REVOCATION_REFRESH_SECONDS)
+            try:
+                await self.reload()
+            except Exception:
+                logger.exception("Reloading revoked sessions failed")
+
+    async def start(self) -> None:
+        """A failed first load doesn't stop the app starting, the loop keeps retrying it"""
+        try:
+            await self.reload()
+        except Exception:
+            logger.exception("Loading revoked sessions failed, retrying in the background")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"revoked": len(self._revoked), "reloads": self.reloads}
+
+
+revocations = RevocationSet()
@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import queue
+import smtplib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+from time import monotonic
+from typing import Any, AsyncIterable, Dict
+from dotenv import load_dotenv
+from os import getenv
+
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+SMTP_SERVER = getenv("SMTP_SERVER")
+SMTP_PORT = int(getenv("SMTP_PORT", 587))
+EMAIL_ADDRESS = getenv("EMAIL_ADDRESS")
+EMAIL_PASSWORD = getenv("EMAIL_PASSWORD")
+# Off for a local sink (python -m aiosmtpd -n -l localhost:8025), which has no TLS or auth
+SMTP_STARTTLS = getenv("SMTP_STARTTLS", "true").lower() == "true"
+SMTP_TIMEOUT = float(getenv("SMTP_TIMEOUT", 30))
+SMTP_POOL_SIZE = int(getenv("SMTP_POOL_SIZE", 3))
+# Providers cap messages per session, the connection is replaced before reaching it
+SMTP_MESSAGES_PER_CONNECTION = int(getenv("SMTP_MESSAGES_PER_CONNECTION", 100))
+SMTP_IDLE_SECONDS = float(getenv("SMTP_IDLE_SECONDS", 60))
+SMTP_RATE_PER_SECOND = float(getenv("SMTP_RATE_PER_SECOND", 10))  # 0 for no limit
+SMTP_MAX_FAILURES = int(getenv("SMTP_MAX_FAILURES", 1000))
+SMTP_PROGRESS_EVERY = int(getenv("SMTP_PROGRESS_EVERY", 200))
+
+
+def build_message(subject: str, body: str, recipient: str) -> EmailMessage:
+    msg = EmailMessage()
+    msg['From'] = EMAIL_ADDRESS
+    msg['To'] = recipient
+    msg['Subject'] = subject
+    msg.set_content(body)
+    return msg
+
+
+class RateLimiter:
+    """Spaces sends evenly at rate per second across all callers"""
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next = 0.0
+
+    async def acquire(self) -> None:
+        if not self.interval:
+            return
+        now = monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class _Connection:
+    def __init__(self, smtp: smtplib.SMTP) -> None:
+        self.smtp = smtp
+        self.sent = 0
+        self.last_used = monotonic()
+
+
+class Mailer:
+    """A small pool of authenticated SMTP connections. smtplib blocks, so every send runs on
+    the mailer's own threads (one per connection) and the event loop only awaits them. A
+    connection carries up to SMTP_MESSAGES_PER_CONNECTION messages before being replaced"""
+
+    def __init__(self, pool_size: int = SMTP_POOL_SIZE, rate: float = SMTP_RATE_PER_SECOND) -> None:
+        self.pool_size = pool_size
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="smtp")
+        self.limiter = RateLimiter(rate)
+        self._idle: "queue.LifoQueue[_Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self.stats = {"connects": 0, "sent": 0, "failed": 0}
+
+    def _connect(self) -> _Connection:
+        smtp = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=SMTP_TIMEOUT)
+        try:
+            if SMTP_STARTTLS:
+                smtp.starttls()
+            if EMAIL_PASSWORD:
+                smtp.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
+        except Exception:
+            smtp.close()
+            raise
+        with self._lock:
+            self.stats["connects"] += 1
+        return _Connection(smtp)
+
+    @staticmethod
+    def _discard(conn: _Connection) -> None:
+        try:
+            conn.smtp.quit()
+        except Exception:
+            conn.smtp.close()
+
+    def _checkout(self) -> _Connection:
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            # Servers drop idle sessions, don't bet a message on an old one
+            if monotonic() - conn.last_used < SMTP_IDLE_SECONDS:
+                return conn
+            self._discard(conn)
+
+    def _checkin(self, conn: _Connection) -> None:
+        conn.last_used = monotonic()
+        if conn.sent >= SMTP_MESSAGES_PER_CONNECTION:
+            self._discard(conn)
+        else:
+            self._idle.put(conn)
+
+    def deliver(self, msg: EmailMessage) -> None:
+        """Blocking send over a pooled connection, retried once on a fresh connection if the
+        pooled one turns out to be dead. Raises on failure"""
+        for attempt in range(2):
+            conn = self._checkout()
+            try:
+                conn.smtp.send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                conn.smtp.close()
+                if attempt:
+                    raise
+                continue
+            except smtplib.SMTPException:
+                # The session is fine, the message was refused. Checked before OSError,
+                # which SMTPException subclasses
+                self._checkin(conn)
+                raise
+            except OSError:
+                conn.smtp.close()
+                if attempt:
+                    raise
+                continue
+            conn.sent += 1
+            self._checkin(conn)
+            return
+
+    async def send(self, msg: EmailMessage) -> None:
+        await self.limiter.acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.executor, self.deliver, msg)
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+        self.stats["sent"] += 1
+
+    async def send_many(self, messages: AsyncIterable[EmailMessage], on_progress=None) -> Dict[str, Any]:
+        """Send a stream of messages with at most pool_size in flight, so a big batch is
+        read from its source as it goes out instead of all up front. A failed recipient
+        is reported, not retried, and doesn't stop the rest"""
+        report: Dict[str, Any] = {"sent": 0, "failed": 0, "errors": []}
+        slots = asyncio.Semaphore(self.pool_size)
+        pending = set()
+
+        async def send_one(msg: EmailMessage) -> None:
+            try:
+                await self.send(msg)
+                report["sent"] += 1
+            except Exception as e:
+                report["failed"] += 1
+                if len(report["errors"]) < SMTP_MAX_FAILURES:
+                    report["errors"].append({"recipient": msg["To"], "error": str(e)})
+            finally:
+                slots.release()
+
+        reported = 0
+        async for msg in messages:
+            await slots.acquire()
+            task = asyncio.create_task(send_one(msg))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            done = report["sent"] + report["failed"]
+            if on_progress and done - reported >= SMTP_PROGRESS_EVERY:
+                reported = done
+                await on_progress({"sent": report["sent"], "failed": report["failed"]})
+        if pending:
+            await asyncio.gather(*pending)
+        return report
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    def status(self) -> Dict[str, Any]:
+        return {**self.stats, "idle_connections": self._idle.qsize(), "pool_size": self.pool_size}
+
+
+mailer = Mailer()
+
+
+def send_email(subject: str, body: str, recipient: str) -> None:
+    """Blocking single send over the pool. Raises on failure. In the app use the "email" job
+    or Mailer.send, this is for scripts"""
+    mailer.deliver(build_message(subject, body, recipient))
+    logger.info(f"Email sent to {recipient}")
@@ -0,0 +1,184 @@
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, List
+from dotenv import load_dotenv
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from core.database import AsyncSession, AsyncSessionLocal
+from crud.event import add_event_images, touch_event, refresh_event_stats
+from models.models import UserImage
+from services.cache import listing_cache
+from services.images import process_and_upload
+from services.uploader import delete_objects, image_keys
+from services.jobs import handler, enqueue, JobContext, PermanentError
+from services.roster import import_roster
+from services.smtp import build_message, mailer
+from services.notifications import notify_event_participants
+from services.sessions import delete_expired_sessions
+
+
+load_dotenv()
+
+JOBS_SPOOL_DIR = os.getenv("JOBS_SPOOL_DIR", tempfile.gettempdir())
+JOBS_EMAIL_CONCURRENCY = int(os.getenv("JOBS_EMAIL_CONCURRENCY", 4))
+JOBS_IMAGE_CONCURRENCY = int(os.getenv("JOBS_IMAGE_CONCURRENCY", 2))
+EVENT_STATS_REFRESH_SECONDS = int(os.getenv("EVENT_STATS_REFRESH_SECONDS", 300))
+SESSIONS_CLEANUP_SECONDS = int(os.getenv("SESSIONS_CLEANUP_SECONDS", 3600))
+
+
+def _spool(upload: UploadFile, prefix: str) -> str:
+    with tempfile.NamedTemporaryFile(prefix=prefix, dir=JOBS_SPOOL_DIR, delete=False) as spooled:
+        shutil.copyfileobj(upload.file, spooled)
+    return spooled.name
+
+
+async def spool_to_disk(upload: UploadFile, prefix: str = "upload-") -> str:
+    """The request's upload is closed once the response is sent, jobs read their own copy.
+    Workers run in the app processes, so JOBS_SPOOL_DIR only has to be local to the host"""
+    return await run_in_threadpool(_spool, upload, prefix)
+
+
+def _remove(paths: List[str]) -> None:
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# Email
+
+def queue_email(db: AsyncSession, subject: str, body: str, recipient: str):
+    return enqueue(db, "email", {"subject": subject, "body": body, "recipient": recipient})
+
+
+@handler("email", concurrency=JOBS_EMAIL_CONCURRENCY, max_attempts=5)
+async def email_job(ctx: JobContext, payload: Dict[str, Any]) -> None:
+    await mailer.send(build_message(payload["subject"], payload["body"], payload["recipient"]))
+
+
+@handler("event_notification", concurrency=1, max_attempts=1)
+async def event_notification_job(ctx: JobContext, payload: Dict[str, Any]) -> Dict[str, Any]:
+    # Not retried: a rerun would mail everyone who already got it
+    return await notify_event_participants(payload["event_id"], payload["subject"], payload["body"], ctx.report)
+
+
+# Bucket
+
+def queue_bucket_cleanup(db: AsyncSession, keys: List[str]):
+    """Delete bucket objects once the caller commits, a rolled back transaction takes the job with it"""
+    return enqueue(db, "bucket_cleanup", {"keys": keys}) if keys else None
+
+
+@handler("bucket_cleanup", concurrency=1, max_attempts=5)
+async def bucket_cleanup_job(ctx: JobContext, payload: Dict[str, Any]) -> Dict[str, Any]:
+    errors = await run_in_threadpool(delete_objects, payload["keys"])
+    if errors:
+        raise RuntimeError(f"{len(errors)} of {len(payload['keys'])} objects not deleted: {errors[0].get('Message')}")
+    return {"deleted": len(payload["keys"])}
+
+
+# Images
+
+@handler("event_images", concurrency=JOBS_IMAGE_CONCURRENCY, max_attempts=3)
+async def event_images_job(ctx: JobContext, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Resize, upload and record the spooled images of an event. A stored file's spool copy is
+    removed right after its row commits, so a retry only redoes the ones still on disk.
+    Files that aren't readable images are dropped on the first attempt and not retried"""
+    event_id = payload["event_id"]
+    paths = {item["save_name"]: item["path"] for item in payload["files"]}
+    pending = {save_name: path for save_name, path in paths.items() if os.path.exists(path)}
+    earlier = (ctx.progress or {}).get("rejected", [])  # not images, dropped by an earlier attempt
+    try:
+        uploads = []
+        if pending:
+            handles = {save_name: open(path, "rb") for save_name, path in pending.items()}
+            try:
+                uploads = await process_and_upload(
+                    [UploadFile(handle) for handle in handles.values()], list(handles), destination="events"
+                )
+            finally:
+                for handle in handles.values():
+                    handle.close()
+
+        stored = [upload for upload in uploads if upload["ok"]]
+        image_ids = []
+        if stored:
+            async with AsyncSessionLocal() as db:
+                image_ids = await add_event_images(
+                    db, event_id, [{"image_id": upload["link"], "variants": upload["variants"]} for upload in stored]
+                )
+                await touch_event(db, event_id)
+                await db.commit()
+            await listing_cache.invalidate()
+            _remove([pending[upload["save_name"]] for upload in stored])
+
+        failed = [upload for upload in uploads if not upload["ok"] and upload["retry"]]
+        bad = [upload for upload in uploads if not upload["ok"] and not upload["retry"]]
+        _remove([pending[upload["save_name"]] for upload in bad])
+        rejected = earlier + [{"save_name": upload["save_name"], "error": upload["error"]} for upload in bad]
+        if failed and not ctx.last_attempt:
+            if bad:
+                await ctx.report({"rejected": rejected})
+            raise RuntimeError(f"{len(failed)} of {len(uploads)} images failed: {failed[0]['error']}")
+        return {
+            "event_id": event_id,
+            "stored": len(paths) - len(pending) - len(earlier) + len(stored),
+            "image_ids": image_ids,
+            "failed": rejected + [{"save_name": upload["save_name"], "error": upload["error"]} for upload in failed],
+        }
+    finally:
+        if ctx.last_attempt:
+            _remove(list(paths.values()))
+
+
+@handler("avatar", concurrency=JOBS_IMAGE_CONCURRENCY, max_attempts=3)
+async def avatar_job(ctx: JobContext, payload: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        with open(payload["path"], "rb") as handle:
+            upload, = await process_and_upload([UploadFile(handle)], [payload["save_name"]], destination="users")
+        if not upload["ok"]:
+            if not upload["retry"]:
+                _remove([payload["path"]])
+                raise PermanentError(f"avatar rejected: {upload['error']}")
+            raise RuntimeError(f"avatar upload failed: {upload['error']}")
+
+        async with AsyncSessionLocal() as db:
+            user_image = await db.get(UserImage, payload["user_id"])
+            if not user_image:
+                db.add(UserImage(user_id=payload["user_id"], avatar_url=upload["link"], variants=upload["variants"]))
+            else:
+                queue_bucket_cleanup(db, image_keys(user_image.avatar_url, user_image.variants))
+                user_image.avatar_url = upload["link"]
+                user_image.variants = upload["variants"]
+            await db.commit()
+        _remove([payload["path"]])
+        return {"avatar_url": upload["link"], "variants": upload["variants"]}
+    finally:
+        if ctx.last_attempt:
+            _remove([payload["path"]])
+
+
+# Bulk
+
+@handler("roster_import", concurrency=1, max_attempts=1)
+async def roster_import_job(ctx: JobContext, payload: Dict[str, Any]) -> Dict[str, Any]:
+    # Not retried: rows of a failed run may already be in, a rerun would report them as duplicates
+    return await import_roster(ctx, payload["path"], payload["format"])
+
+
+# Stats
+
+@handler("event_stats_refresh", concurrency=1, max_attempts=1, every=EVENT_STATS_REFRESH_SECONDS)
+async def event_stats_refresh_job(ctx: JobContext, payload: Dict[str, Any]) -> Dict[str, Any]:
+    async with AsyncSessionLocal() as db:
+        result = await refresh_event_stats(db)
+    # Ratings and enrollments don't invalidate the listing, it catches up here
+    await listing_cache.invalidate()
+    return result
+
+
+# Sessions
+
+@handler("sessions_cleanup", concurrency=1, max_attempts=1, every=SESSIONS_CLEANUP_SECONDS)
+async def sessions_cleanup_job(ctx: JobContext, payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {"deleted": await delete_expired_sessions()}
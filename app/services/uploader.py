@@ -1,19 +1,30 @@
 from fastapi import APIRouter, File
 from typing import Optional
 from fastapi import UploadFile
-from urllib.parse import quote
+from urllib.parse import quote, unquote
 from dotenv import load_dotenv
-import os, boto3
-from botocore.exceptions import NoCredentialsError, PartialCredentialsError
-from typing import List, Optional
+import asyncio, logging, os, boto3
+from time import perf_counter
+from concurrent.futures import ThreadPoolExecutor
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import NoCredentialsError, PartialCredentialsError, ClientError
+from typing import List, Optional, Dict, Any
+from core.metrics import METRICS_ENABLED, instrument_s3
 
 
 load_dotenv()
+logger = logging.getLogger(__name__)
 
 LIARA_ENDPOINT = os.getenv("LIARA_ENDPOINT")
 LIARA_ACCESS_KEY = os.getenv("LIARA_ACCESS_KEY")
 LIARA_SECRET_KEY = os.getenv("LIARA_SECRET_KEY")
 LIARA_BUCKET_NAME = os.getenv("LIARA_BUCKET_NAME")
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", 8))
+UPLOAD_MULTIPART_THRESHOLD_MB = int(os.getenv("UPLOAD_MULTIPART_THRESHOLD_MB", 8))
+UPLOAD_PART_CONCURRENCY = int(os.getenv("UPLOAD_PART_CONCURRENCY", 4))
+PRESIGN_EXPIRES_SECONDS = int(os.getenv("PRESIGN_EXPIRES_SECONDS", 600))
+PRESIGN_MAX_BYTES = int(os.getenv("PRESIGN_MAX_BYTES", 10 * 1024 * 1024))
+S3_DELETE_BATCH = 1000  # most keys one delete_objects request takes
 
 s3 = boto3.client(
     "s3",
@@ -21,6 +32,23 @@ s3 = boto3.client(
     aws_access_key_id=LIARA_ACCESS_KEY,
     aws_secret_access_key=LIARA_SECRET_KEY,
 )
+if METRICS_ENABLED:
+    instrument_s3(s3)
+
+# Big files go up as parallel multipart chunks read straight from the spooled UploadFile
+transfer_config = TransferConfig(
+    multipart_threshold=UPLOAD_MULTIPART_THRESHOLD_MB * 1024 * 1024,
+    multipart_chunksize=UPLOAD_MULTIPART_THRESHOLD_MB * 1024 * 1024,
+    max_concurrency=UPLOAD_PART_CONCURRENCY,
+)
+CONTENT_TYPES = {
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "webp": "image/webp",
+}
+# One file per thread, shared by every BucketObj_2 in the process
+upload_executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="s3-upload")
 
 
 
@@ -29,22 +57,30 @@ class BucketObj_2:
     """Version2 support multiple image uploading. permalink works as attribute and returns links
     as a list"""
 
-    def __init__(self, files: List[Optional[UploadFile]], save_names: List[str], destination: str, format_: str = "jpg") -> None:
+    def __init__(self, files: List[Optional[UploadFile]], save_names: List[str], destination: str, format_: str = "jpg", client=None) -> None:
         self.files = files
         self.save_names = save_names
         self.destination = destination
         self.format_ = format_
+        # Any boto3 s3 client, tests can pass one bound to moto or a local MinIO
+        self.client = client or s3
+        self.extra_args = {"ContentType": CONTENT_TYPES[format_]} if format_ in CONTENT_TYPES else None
         self.perma_links = self.generate_perma_links()
 
+    def object_key(self, save_name: str) -> str:
+        return f'{self.destination}/{save_name}.{self.format_}'
+
     def upload_images(self) -> None:
         for file, save_name in zip(self.files, self.save_names):
             try:
                 if not file:
                     raise ValueError(f"File for {save_name} is None")
-                s3.upload_fileobj(
+                self.client.upload_fileobj(
                     file.file,
                     LIARA_BUCKET_NAME,
-                    f'{self.destination}/{save_name}.{self.format_}'
+                    self.object_key(save_name),
+                    ExtraArgs=self.extra_args,
+                    Config=transfer_config
                 )
             except (NoCredentialsError, PartialCredentialsError) as e:
                 raise RuntimeError(f"Credential error for file {save_name}: {str(e)}")
@@ -53,13 +89,110 @@ class BucketObj_2:
             except Exception as e:
                 raise RuntimeError(f"Failed to upload {save_name}: {str(e)}")
 
+    def upload_one(self, file: Optional[UploadFile], save_name: str, link: str) -> Dict[str, Any]:
+        """Upload a single file and report how it went instead of raising"""
+        sent: List[int] = []
+        start = perf_counter()
+        result = {"save_name": save_name, "key": self.object_key(save_name), "link": link, "ok": True, "error": None}
+        try:
+            if not file:
+                raise ValueError(f"File for {save_name} is None")
+            self.client.upload_fileobj(
+                file.file,
+                LIARA_BUCKET_NAME,
+                result["key"],
+                ExtraArgs=self.extra_args,
+                Config=transfer_config,
+                Callback=sent.append
+            )
+        except Exception as e:
+            result.update(ok=False, error=f"{type(e).__name__}: {e}")
+        result["bytes"] = sum(sent)
+        result["seconds"] = round(perf_counter() - start, 4)
+        return result
+
+    def upload_images_concurrent(self) -> List[Dict[str, Any]]:
+        """Upload all files in parallel on the upload pool, one result dict per file in input order"""
+        return list(upload_executor.map(self.upload_one, self.files, self.save_names, self.perma_links))
+
+    async def upload_images_async(self) -> List[Dict[str, Any]]:
+        """upload_images_concurrent for async handlers, the event loop only awaits the pool"""
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(*(
+            loop.run_in_executor(upload_executor, self.upload_one, file, save_name, link)
+            for file, save_name, link in zip(self.files, self.save_names, self.perma_links)
+        ))
+
     def generate_perma_links(self) -> List[str]:
         links = []
         for save_name in self.save_names:
-            obj_filename_encoded = quote(f'{self.destination}/{save_name}.{self.format_}')
-            obj_perma_link = f"https://{LIARA_BUCKET_NAME}.{LIARA_ENDPOINT.replace('https://', '')}/{obj_filename_encoded}"
-            links.append(obj_perma_link)
-        print("Generated perma_links: ", links)  
+            links.append(perma_link(self.object_key(save_name)))
+        logger.debug(f"Generated perma_links: {links}")
         return links
 
 
+def perma_link(key: str) -> str:
+    return f"https://{LIARA_BUCKET_NAME}.{LIARA_ENDPOINT.replace('https://', '')}/{quote(key)}"
+
+
+def link_key(link: str) -> Optional[str]:
+    """Object key back from a perma_link, None for links outside the bucket"""
+    prefix = perma_link("")
+    return unquote(link[len(prefix):]) if link and link.startswith(prefix) else None
+
+
+def image_keys(link: Optional[str], variants: Optional[Dict[str, str]] = None) -> List[str]:
+    """Every object behind a stored image: the main file and its resized variants"""
+    links = [link, *(variants or {}).values()]
+    return [key for key in map(link_key, links) if key]
+
+
+def delete_objects(keys: List[str], client=None) -> List[Dict[str, Any]]:
+    """Delete keys with batched delete_objects requests (S3_DELETE_BATCH per call instead
+    of one request per key). Returns the per-key errors, missing keys don't count as errors"""
+    errors = []
+    for start in range(0, len(keys), S3_DELETE_BATCH):
+        response = (client or s3).delete_objects(
+            Bucket=LIARA_BUCKET_NAME,
+            Delete={"Objects": [{"Key": key} for key in keys[start:start + S3_DELETE_BATCH]], "Quiet": True}
+        )
+        errors.extend(response.get("Errors", []))
+    return errors
+
+
+def presign_upload(key: str, format_: str, client=None) -> Dict[str, Any]:
+    """Presigned POST so the client sends the file straight to the bucket.
+    Content type is pinned to the format and the size capped at PRESIGN_MAX_BYTES"""
+    content_type = CONTENT_TYPES[format_]
+    post = (client or s3).generate_presigned_post(
+        LIARA_BUCKET_NAME,
+        key,
+        Fields={"Content-Type": content_type},
+        Conditions=[
+            {"Content-Type": content_type},
+            ["content-length-range", 1, PRESIGN_MAX_BYTES],
+        ],
+        ExpiresIn=PRESIGN_EXPIRES_SECONDS
+    )
+    return {"key": key, "url": post["url"], "fields": post["fields"], "link": perma_link(key)}
+
+
+def object_size(key: str, client=None) -> Optional[int]:
+    """Size of an uploaded object, None when it isn't in the bucket"""
+    try:
+        head = (client or s3).head_object(Bucket=LIARA_BUCKET_NAME, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+    return head["ContentLength"]
+
+
+async def object_sizes(keys: List[str], client=None) -> List[Optional[int]]:
+    """object_size for many keys at once on the upload pool"""
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(
+        loop.run_in_executor(upload_executor, object_size, key, client) for key in keys
+    ))
+
+
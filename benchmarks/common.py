@@ -0,0 +1,40 @@
+"""Shared setup for the benchmarks that drive the real app in-process over httpx's ASGI transport.
+
+bootstrap() has to run before `config` is imported: the app reads its settings and creates
+its engines at import time.
+"""
+import os
+import statistics
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def bootstrap(db_name: str, **env: str) -> None:
+    """Put app/ on the path and default the settings the app needs, DATABASE_URL to a
+    temporary SQLite file. Values already in the environment win"""
+    sys.path.insert(0, os.path.join(ROOT, "app"))
+    os.chdir(ROOT)  # templates and static are resolved relative to the repo root
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), db_name)}")
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ.setdefault("ALGORITHM", "HS256")
+    os.environ.setdefault("FIRST_SUPERADMIN_USERNAME", "bench_admin")
+    os.environ.setdefault("FIRST_SUPERADMIN_PASSWORD", "bench_password")
+    for name, value in env.items():
+        os.environ.setdefault(name, value)
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "count": len(ordered),
+        "p50_ms": round(pick(0.50) * 1000, 2),
+        "p95_ms": round(pick(0.95) * 1000, 2),
+        "p99_ms": round(pick(0.99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 2),
+    }
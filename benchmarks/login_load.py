@@ -0,0 +1,88 @@
+"""Concurrent login throughput and the latency of an unrelated endpoint during the burst.
+
+Runs the real app in-process over httpx's ASGI transport against a temporary SQLite
+database (or DATABASE_URL if set). While `--logins` logins run `--concurrency` at a time,
+a probe keeps requesting /api/admin/get_me (uncached, one query per call), so a blocked
+event loop shows up directly in the probe percentiles:
+
+    python benchmarks/login_load.py --logins 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import os
+from time import perf_counter
+
+from common import bootstrap, percentiles
+
+bootstrap("login_load.db")
+
+import httpx  # noqa: E402
+from config import app  # noqa: E402
+from core.database import async_engine, engine  # noqa: E402
+from middleware.auth_middleware import hash_pool  # noqa: E402
+
+
+async def run(logins: int, concurrency: int) -> dict:
+    await app.router.startup()
+    credentials = {
+        "username": os.environ["FIRST_SUPERADMIN_USERNAME"],
+        "password": os.environ["FIRST_SUPERADMIN_PASSWORD"],
+    }
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            response = await client.post("/api/auth/admin/login", data=credentials)
+            admin = {"Authorization": f"Bearer {response.json()['access_token']}"}
+            login_times, probe_times, statuses = [], [], {}
+            done = asyncio.Event()
+            gate = asyncio.Semaphore(concurrency)
+
+            async def login():
+                async with gate:
+                    start = perf_counter()
+                    response = await client.post("/api/auth/admin/login", data=credentials)
+                    login_times.append(perf_counter() - start)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            async def probe():
+                while not done.is_set():
+                    start = perf_counter()
+                    response = await client.get("/api/admin/get_me", headers=admin)
+                    response.raise_for_status()
+                    probe_times.append(perf_counter() - start)
+                    await asyncio.sleep(0.01)
+
+            probe_task = asyncio.create_task(probe())
+            started = perf_counter()
+            await asyncio.gather(*(login() for _ in range(logins)))
+            elapsed = perf_counter() - started
+            done.set()
+            await probe_task
+    finally:
+        await app.router.shutdown()
+        hash_pool.executor.shutdown()
+        await async_engine.dispose()
+        engine.dispose()
+
+    return {
+        "logins": logins,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "logins_per_s": round(logins / elapsed, 2),
+        "login_status": statuses,
+        "login_latency": percentiles(login_times),
+        "unrelated_latency": percentiles(probe_times),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.logins, args.concurrency)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
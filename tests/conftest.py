@@ -0,0 +1,82 @@
+"""Tests drive the real app in-process over httpx's ASGI transport, against a temporary
+SQLite database. The app reads its settings and creates its engines at import, so the
+environment is set up here before anything under app/ is imported."""
+import itertools
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+os.chdir(ROOT)  # templates and static are resolved relative to the repo root
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("FIRST_SUPERADMIN_USERNAME", "test_admin")
+os.environ.setdefault("FIRST_SUPERADMIN_PASSWORD", "test_password")
+os.environ.setdefault("LIARA_ENDPOINT", "https://storage.example.com")
+os.environ.setdefault("LIARA_BUCKET_NAME", "bucket")
+os.environ.setdefault("LIARA_ACCESS_KEY", "test")
+os.environ.setdefault("LIARA_SECRET_KEY", "test")
+os.environ.setdefault("JOBS_ENABLED", "false")
+
+_user_numbers = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+async def app(anyio_backend):
+    from config import app
+
+    await app.router.startup()
+    yield app
+    await app.router.shutdown()
+
+
+@pytest.fixture
+async def client(app):
+    import httpx
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+async def admin_headers(client):
+    response = await client.post("/api/auth/admin/login", data={
+        "username": os.environ["FIRST_SUPERADMIN_USERNAME"],
+        "password": os.environ["FIRST_SUPERADMIN_PASSWORD"],
+    })
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+
+@pytest.fixture
+def make_users(app):
+    """Insert students with unique usernames, returns their ids"""
+    from sqlalchemy import insert
+
+    from core.database import AsyncSessionLocal
+    from models.models import User
+
+    async def make_users(count: int, **values):
+        rows = []
+        for n in itertools.islice(_user_numbers, count):
+            rows.append({
+                "username": f"student{n}", "password": "x", "name": f"name {n}", "lname": "lname",
+                "fa_name": "fa_name", "id_number": f"{n:010d}", "sid": f"{n:011d}",
+                "phone_number": f"09{n:09d}", "role_id": 1, **values,
+            })
+        async with AsyncSessionLocal() as db:
+            ids = list((await db.execute(insert(User).returning(User.id), rows)).scalars())
+            await db.commit()
+        return ids
+
+    return make_users
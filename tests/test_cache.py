@@ -0,0 +1,26 @@
+import pytest
+
+from services.cache import MemoryBackend, ResponseCache
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_generation_survives_lru_eviction():
+    cache = ResponseCache(MemoryBackend(maxsize=2), "test", ttl=60)
+    generation = await cache.generation()
+    for page in range(5):
+        await cache.set({"page": page}, b"[]", generation)
+    assert await cache.generation() == generation
+    assert await cache.get({"page": 4}, generation) is not None
+
+    await cache.invalidate()
+    assert await cache.generation() > generation
+    assert await cache.get({"page": 4}, await cache.generation()) is None
+
+
+def test_production_refuses_several_workers_on_the_memory_cache(monkeypatch):
+    import main
+
+    monkeypatch.setattr("services.cache.CACHE_BACKEND", "memory")
+    with pytest.raises(SystemExit, match="CACHE_BACKEND=redis"):
+        main.serve_production(2)
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from core.database import AsyncSessionLocal
+from models.models import Event
+from schemas.event import EventBase, EventUpdate
+from schemas.types import naive_utc
+
+TEHRAN = timezone(timedelta(hours=3, minutes=30))
+
+
+def test_naive_utc_converts_aware_values():
+    assert naive_utc(datetime(2025, 3, 1, 12, 0, tzinfo=TEHRAN)) == datetime(2025, 3, 1, 8, 30)
+    assert naive_utc(datetime(2025, 3, 1, 12, 0)) == datetime(2025, 3, 1, 12, 0)
+    assert naive_utc(None) is None
+
+
+def test_event_schemas_store_naive_utc():
+    event = EventBase(
+        subject="tz event", description="timezones", text=None, code=None,
+        start_date="2025-03-01T12:00:00+03:30", end_date="2025-03-02T12:00:00Z",
+    )
+    assert event.start_date == datetime(2025, 3, 1, 8, 30)
+    assert event.end_date == datetime(2025, 3, 2, 12, 0)
+    update = EventUpdate(start_date="2025-03-01T00:00:00-05:00")
+    assert update.start_date == datetime(2025, 3, 1, 5, 0)
+
+
+@pytest.mark.anyio
+async def test_aware_values_reach_the_database_as_naive_utc(client, admin_headers):
+    async with AsyncSessionLocal() as db:
+        event = Event(subject="tz event", start_date=datetime(2025, 3, 1, 8), end_date=datetime(2025, 3, 2, 8))
+        db.add(event)
+        await db.commit()
+
+    response = await client.put(
+        f"/api/admin/event/update/{event.id}", headers=admin_headers, json={"start_date": "2025-03-01T12:00:00+03:30"},
+    )
+    assert response.status_code == 200, response.text
+    async with AsyncSessionLocal() as db:
+        stored = await db.get(Event, event.id)
+    assert stored.start_date == datetime(2025, 3, 1, 8, 30)
+    assert stored.start_date.tzinfo is None
+
+    # 09:00+03:30 is 05:30 utc, before the event starts
+    response = await client.get("/api/admin/event/get_all/", params={"start_date": "2025-03-01T09:00:00+03:30", "limit": 1000})
+    assert response.status_code == 200, response.text
+    assert event.id in [item["id"] for item in response.json()]
+    response = await client.get("/api/admin/event/get_all/", params={"start_date": "2025-03-01T12:30:00+03:30", "limit": 1000})
+    assert event.id not in [item["id"] for item in response.json()]
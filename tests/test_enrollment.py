@@ -0,0 +1,62 @@
+import asyncio
+import sqlite3
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+
+from core.database import AsyncSessionLocal
+from middleware.auth_middleware import AuthService
+from models.models import Event, UserEvents
+
+pytestmark = pytest.mark.anyio
+
+
+async def make_event(**values) -> int:
+    async with AsyncSessionLocal() as db:
+        event = Event(subject="enrollment", start_date=datetime(2032, 1, 1), end_date=datetime(2032, 1, 2), **values)
+        db.add(event)
+        await db.commit()
+    return event.id
+
+
+def headers(user_id: int) -> dict:
+    return {"Authorization": f"Bearer {AuthService.create_access_token(user_id, 1)}"}
+
+
+async def test_concurrent_joins_fill_exactly_the_capacity(client, make_users):
+    capacity, students = 10, 60
+    event_id = await make_event(capacity=capacity)
+    users = await make_users(students)
+
+    async def join(user_id: int) -> int:
+        # 503 is lock contention, clients are told to retry it
+        while True:
+            response = await client.post(f"/api/user/join-event/{event_id}", headers=headers(user_id))
+            if response.status_code != 503:
+                return response.status_code
+            assert response.headers["Retry-After"]
+            await asyncio.sleep(0.05)
+
+    statuses = await asyncio.gather(*(join(user_id) for user_id in users))
+    assert statuses.count(200) == capacity
+    assert statuses.count(409) == students - capacity
+
+    async with AsyncSessionLocal() as db:
+        event = await db.get(Event, event_id)
+        enrolled = await db.scalar(select(func.count()).select_from(UserEvents).where(UserEvents.event_id == event_id))
+    assert event.enrolled_count == enrolled == capacity
+
+
+async def test_database_lock_answers_503(client, make_users, monkeypatch):
+    event_id = await make_event()
+    user_id, = await make_users(1)
+
+    async def locked(db, event_id):
+        raise OperationalError("UPDATE events", {}, sqlite3.OperationalError("database is locked"))
+
+    monkeypatch.setattr("routers.user.take_seat", locked)
+    response = await client.post(f"/api/user/join-event/{event_id}", headers=headers(user_id))
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,19 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+LISTING = "/api/admin/event/get_all/"
+
+
+async def test_create_event_is_mounted_and_invalidates_the_listing(client, admin_headers):
+    params = {"search": "mounted", "limit": 10}
+    assert (await client.get(LISTING, params=params)).json() == []  # now cached
+
+    response = await client.post("/api/admin/event/create", headers=admin_headers, json={
+        "subject": "mounted", "description": "create route", "text": None, "code": None,
+        "start_date": "2031-01-01T10:00:00", "end_date": "2031-01-02T10:00:00",
+    })
+    assert response.status_code == 200, response.text
+
+    listed = (await client.get(LISTING, params=params)).json()
+    assert [event["subject"] for event in listed] == ["mounted"]
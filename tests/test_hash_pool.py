@@ -0,0 +1,33 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from middleware.auth_middleware import HashPool
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_cancelled_caller_keeps_the_slot_until_the_hash_finishes():
+    pool = HashPool(workers=1, queue_depth=0)
+    release = threading.Event()
+    task = asyncio.create_task(pool.run(release.wait))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    # The thread is still busy, so is the only slot
+    assert pool.inflight == 1
+    with pytest.raises(HTTPException) as refused:
+        await pool.run(len, "")
+    assert refused.value.status_code == 503
+
+    release.set()
+    for _ in range(100):
+        if pool.inflight == 0:
+            break
+        await asyncio.sleep(0.01)
+    assert pool.inflight == 0
+    assert await pool.run(len, "abc") == 3
+    pool.executor.shutdown()
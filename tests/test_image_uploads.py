@@ -0,0 +1,47 @@
+import os
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from models.models import Job
+from services.images import process_image
+from services.jobs import JobContext
+from services.tasks import event_images_job
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_upload_rejects_non_images(client, admin_headers):
+    response = await client.post(
+        "/api/admin/event/add/1/images", headers=admin_headers,
+        files=[("files", ("notes.txt", b"not an image", "text/plain"))],
+    )
+    assert response.status_code == 415, response.text
+    response = await client.post(
+        "/api/admin/admin/upload-image", headers=admin_headers,
+        files={"file": ("notes.txt", b"not an image", "text/plain")},
+    )
+    assert response.status_code == 415, response.text
+
+
+async def test_undecodable_image_fails_on_the_first_attempt(app, tmp_path):
+    path = tmp_path / "junk.jpg"
+    path.write_bytes(b"not really a jpeg")
+    ctx = JobContext(Job(id="test", type="event_images", attempts=1, max_attempts=3, progress=None))
+    assert not ctx.last_attempt
+
+    result = await event_images_job(ctx, {"event_id": 1, "files": [{"save_name": "1_junk", "path": str(path)}]})
+    assert result["stored"] == 0
+    assert [failure["save_name"] for failure in result["failed"]] == ["1_junk"]
+    assert "Not a readable image" in result["failed"][0]["error"]
+    assert not os.path.exists(path)
+
+
+def test_decompression_bomb_is_not_a_readable_image(monkeypatch):
+    data = BytesIO()
+    Image.new("RGB", (100, 100)).save(data, format="PNG")
+    # Over twice the limit, where Pillow raises instead of warning
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+    with pytest.raises(ValueError, match="DecompressionBombError"):
+        process_image(data.getvalue())
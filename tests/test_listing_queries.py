@@ -0,0 +1,66 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, insert
+
+from core.database import AsyncSessionLocal, async_engine
+from models.models import Event, EventImage, UserImage
+from services.cache import listing_cache
+
+pytestmark = pytest.mark.anyio
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", before_execute)
+
+
+async def page_statements(client, path, **kwargs) -> int:
+    # A cached page wouldn't touch the database at all
+    await listing_cache.invalidate()
+    with count_statements() as statements:
+        response = await client.get(path, **kwargs)
+    assert response.status_code == 200, response.text
+    return len(statements)
+
+
+async def test_get_all_statements_dont_grow_with_the_page(client):
+    start = datetime(2030, 1, 1)
+    async with AsyncSessionLocal() as db:
+        events = (await db.execute(insert(Event).returning(Event.id), [
+            {"subject": f"listing {i}", "start_date": start + timedelta(days=i), "end_date": start + timedelta(days=i + 1)}
+            for i in range(40)
+        ])).scalars().all()
+        await db.execute(insert(EventImage), [
+            {"event_id": event_id, "image_id": f"https://bucket.example.com/{event_id}_{n}.webp"}
+            for event_id in events for n in range(2)
+        ])
+        await db.commit()
+
+    params = {"start_date": start.isoformat()}
+    small = await page_statements(client, "/api/admin/event/get_all/", params={**params, "limit": 2})
+    large = await page_statements(client, "/api/admin/event/get_all/", params={**params, "limit": 40})
+    assert 0 < small == large
+
+
+async def test_get_users_statements_dont_grow_with_the_page(client, admin_headers, make_users):
+    await make_users(2)
+    before = await page_statements(client, "/api/admin/get_users/", headers=admin_headers)
+    users = await make_users(30)
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(UserImage), [
+            {"user_id": user_id, "avatar_url": f"https://bucket.example.com/{user_id}.webp"} for user_id in users
+        ])
+        await db.commit()
+    after = await page_statements(client, "/api/admin/get_users/", headers=admin_headers)
+    assert 0 < before == after
@@ -0,0 +1,26 @@
+import pytest
+from sqlalchemy import create_engine, exc
+from sqlalchemy.pool import QueuePool
+
+from core.pool import PoolStats, instrumented_pool
+
+
+def test_waits_count_only_blocked_checkouts(tmp_path):
+    stats = PoolStats("test")
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}", poolclass=instrumented_pool(QueuePool, stats),
+        pool_size=1, max_overflow=0, pool_timeout=0.05,
+    )
+    # At capacity, but the idle connection is handed out without waiting
+    for _ in range(3):
+        engine.connect().close()
+    assert stats.waits == 0
+
+    held = engine.connect()
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    held.close()
+    assert stats.waits == 1
+    assert stats.timeouts == 1
+    assert stats.max_wait_seconds >= 0.05
+    engine.dispose()
@@ -0,0 +1,94 @@
+import csv
+
+import pytest
+from sqlalchemy.exc import DataError
+
+from core.database import AsyncSessionLocal
+from models.models import Job
+from services.jobs import JobContext
+from services import roster
+from services.roster import import_roster, insert_users
+
+pytestmark = pytest.mark.anyio
+
+FIELDS = [
+    "username", "password", "email", "name", "sid", "lname", "fa_name", "phone_number", "birth_date",
+    "id_number", "major", "degree", "address", "birth_city",
+]
+
+
+def student(n: int, **values) -> dict:
+    return {
+        "username": f"roster{n}", "password": "password123", "email": f"roster{n}@example.com",
+        "name": f"name {n}", "sid": f"{n:011d}", "lname": "lname", "fa_name": "fa_name",
+        "phone_number": f"09{n:09d}", "birth_date": "2000-01-01T00:00:00", "id_number": f"{n:010d}",
+        "major": "cs", "degree": "bsc", "address": "address", "birth_city": "city", **values,
+    }
+
+
+async def run_import(tmp_path, rows) -> dict:
+    path = tmp_path / "roster.csv"
+    with open(path, "w", newline="") as handle:
+        writer = csv.DictWriter(handle, FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    ctx = JobContext(Job(id="roster", type="roster_import", attempts=1, max_attempts=1, progress=None))
+    return await import_roster(ctx, str(path), "csv")
+
+
+async def test_bad_rows_dont_fail_the_batch(app, tmp_path):
+    rows = [student(n) for n in range(9000, 9007)]
+    rows[3]["email"] = rows[1]["email"]
+    rows[5]["name"] = None
+    report = await run_import(tmp_path, rows)
+
+    assert report["inserted"] == 5
+    assert report["failed"] == 2
+    failed = {error["row"]: error["errors"] for error in report["errors"]}
+    assert set(failed) == {4, 6}
+    assert failed[4] == [f"email {rows[1]['email']} already exists"]
+    assert failed[6] == ["name is required"]
+
+
+async def test_existing_usernames_and_emails_are_duplicates(app, tmp_path, make_users):
+    await make_users(1, username="taken_name", email="taken@example.com")
+    rows = [student(n) for n in range(9100, 9104)]
+    rows[0]["username"] = "taken_name"
+    rows[2]["email"] = "taken@example.com"
+    report = await run_import(tmp_path, rows)
+
+    assert report["inserted"] == 2
+    assert report["duplicates"] == 2
+    assert [error["row"] for error in report["errors"]] == [1, 3]
+
+
+async def test_on_conflict_skips_email_clashes(app, make_users):
+    await make_users(1, username="clash_name", email="clash@example.com")
+    values = {**student(9200), "email": "clash@example.com", "role_id": 1}
+    values.pop("birth_date")
+    async with AsyncSessionLocal() as db:
+        assert await insert_users(db, [values]) == set()
+
+
+async def test_long_names_fail_only_their_row(app, tmp_path):
+    rows = [student(n) for n in range(9300, 9303)]
+    rows[1]["name"] = "n" * 30
+    report = await run_import(tmp_path, rows)
+
+    assert report["inserted"] == 2
+    assert report["errors"] == [{"row": 2, "errors": ["name is longer than 20 characters"]}]
+
+
+async def test_data_errors_fail_only_their_row(app, tmp_path, monkeypatch):
+    async def strict_insert(db, values):
+        # What Postgres does with a value the column can't hold
+        if any(value["username"] == "roster9401" for value in values):
+            raise DataError("INSERT INTO users", {}, Exception("value too long for type character varying(20)"))
+        return await insert_users(db, values)
+
+    monkeypatch.setattr(roster, "insert_users", strict_insert)
+    report = await run_import(tmp_path, [student(n) for n in range(9400, 9403)])
+
+    assert report["inserted"] == 2
+    assert [error["row"] for error in report["errors"]] == [2]
+    assert "value too long" in report["errors"][0]["errors"][0]
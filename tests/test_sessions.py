@@ -0,0 +1,38 @@
+import os
+
+import pytest
+from sqlalchemy import select
+
+from core.database import AsyncSessionLocal
+from models.models import User
+from services.sessions import RevocationSet
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_login_records_last_login(client):
+    username = os.environ["FIRST_SUPERADMIN_USERNAME"]
+    async with AsyncSessionLocal() as db:
+        before = (await db.execute(select(User.last_login, User.updated_at).where(User.username == username))).one()
+
+    response = await client.post("/api/auth/admin/login", data={
+        "username": username, "password": os.environ["FIRST_SUPERADMIN_PASSWORD"],
+    })
+    assert response.status_code == 200, response.text
+    async with AsyncSessionLocal() as db:
+        after = (await db.execute(select(User.last_login, User.updated_at).where(User.username == username))).one()
+    assert after.last_login is not None
+    assert before.last_login is None or after.last_login > before.last_login
+    assert after.updated_at == before.updated_at
+
+
+async def test_revocations_start_survives_a_failed_load(app, monkeypatch):
+    revocations = RevocationSet()
+
+    async def unavailable():
+        raise ConnectionError("database unavailable")
+
+    monkeypatch.setattr(revocations, "reload", unavailable)
+    await revocations.start()
+    assert revocations._task is not None
+    await revocations.stop()
@@ -0,0 +1,69 @@
+import smtplib
+from email.message import EmailMessage
+
+import pytest
+
+from services.smtp import Mailer, _Connection
+
+
+class StubSMTP:
+    """Stands in for smtplib.SMTP, send_message runs the next queued outcome"""
+
+    def __init__(self, outcomes):
+        self.outcomes = outcomes
+        self.sent = 0
+        self.closed = False
+
+    def send_message(self, msg):
+        outcome = self.outcomes.pop(0) if self.outcomes else None
+        if outcome is not None:
+            raise outcome
+        self.sent += 1
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+def stub_mailer(monkeypatch, outcomes):
+    mailer = Mailer(pool_size=1, rate=0)
+    connections = []
+
+    def connect():
+        connections.append(StubSMTP(outcomes))
+        return _Connection(connections[-1])
+
+    monkeypatch.setattr(mailer, "_connect", connect)
+    return mailer, connections
+
+
+def message() -> EmailMessage:
+    msg = EmailMessage()
+    msg["To"] = "nobody@example.com"
+    msg.set_content("hello")
+    return msg
+
+
+def test_refused_recipient_is_sent_once_and_keeps_the_connection(monkeypatch):
+    refused = smtplib.SMTPRecipientsRefused({"nobody@example.com": (550, b"no such user")})
+    mailer, connections = stub_mailer(monkeypatch, [refused])
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        mailer.deliver(message())
+
+    assert len(connections) == 1
+    assert not connections[0].closed
+    assert mailer._idle.qsize() == 1
+    mailer.deliver(message())
+    assert len(connections) == 1 and connections[0].sent == 1
+
+
+def test_dropped_connection_is_retried_on_a_fresh_one(monkeypatch):
+    mailer, connections = stub_mailer(monkeypatch, [smtplib.SMTPServerDisconnected("gone")])
+    mailer.deliver(message())
+
+    assert len(connections) == 2
+    assert connections[0].closed
+    assert connections[1].sent == 1
+    assert mailer._idle.qsize() == 1